@@ -1,6 +1,8 @@
 import os
 from enum import Enum
 from pathlib import Path
+from functools import lru_cache
+from typing import Dict
 
 
 class LabelColor(Enum):
@@ -11,10 +13,28 @@ class LabelColor(Enum):
 
 
 BASE_DIR = str(Path(__file__).parent.parent)
+# Where the program was started from, relative files given by the user are in it
+WORKING_DIR = os.getcwd()
 os.chdir(BASE_DIR)
 
-ICONS = os.listdir(Path(f"{BASE_DIR}/icons"))
-get_icon = {f"{icon[:icon.index('.')]}": str(Path(f"{BASE_DIR}/icons/{icon}")) for icon in ICONS}
+
+@lru_cache(maxsize=None)
+def icons() -> Dict[str, str]:
+    """The path of every icon by its name, the directory is only scanned
+    the first time icons are needed (by the gui)
+    """
+    return {
+        f"{icon[:icon.index('.')]}": str(Path(f"{BASE_DIR}/icons/{icon}"))
+        for icon in os.listdir(Path(f"{BASE_DIR}/icons"))
+    }
+
+
+def get_icon(name: str) -> str:
+    return icons()[name]
+
+
+# Dates are stored as epoch seconds and only formatted when displayed
+DATE_FORMAT = '%d/%m/%Y %H:%M'
 VERSIONS = (
     '1.0',
 )
@@ -1,17 +1,20 @@
+from __future__ import annotations
 from datetime import datetime as dt
 from models import Model
+from actions.constants import DATE_FORMAT
 from typing import (
     List,
     Tuple,
 )
 
 FIELDS = ('title', 'content', 'priority', 'date_created', 'date_edited', 'done', 'id')
-DB_ROW = Tuple[str, str, int, str, str, int, int]
+DATE_FIELDS = ('date_created', 'date_edited')
+DB_ROW = Tuple[str, str, int, int, int, int, int]
 DB_VALUES = List[DB_ROW]
 
 
-def _as_date(date: str) -> dt:
-    return dt.strptime(date, '%d/%m/%Y')
+def format_date(epoch: int) -> str:
+    return dt.fromtimestamp(epoch).strftime(DATE_FORMAT)
 
 
 def sort_by(sort_method: str, stickies: DB_VALUES, reversed: bool) -> DB_VALUES:
@@ -20,16 +23,16 @@ def sort_by(sort_method: str, stickies: DB_VALUES, reversed: bool) -> DB_VALUES:
         return sorted(sorted_stickies, key=lambda i: i[FIELDS.index('title')],
                       reverse=reversed)
     elif sort_method == 'content':
-        return sorted(sorted_stickies, key=lambda i: i[slice(FIELDS.index('content'))],
+        return sorted(sorted_stickies, key=lambda i: i[FIELDS.index('content')],
                       reverse=reversed)
     elif sort_method == 'priority':
-        return sorted(sorted_stickies, key=lambda i: i[slice(FIELDS.index('priority'))],
+        return sorted(sorted_stickies, key=lambda i: i[FIELDS.index('priority')],
                       reverse=reversed)
     elif sort_method == 'date_created':
-        return sorted(sorted_stickies, key=lambda i: _as_date(i[FIELDS.index('date_created')]),
+        return sorted(sorted_stickies, key=lambda i: i[FIELDS.index('date_created')],
                       reverse=reversed)
     elif sort_method == 'date_edited':
-        return sorted(sorted_stickies, key=lambda i: _as_date(i[FIELDS.index('date_edited')]),
+        return sorted(sorted_stickies, key=lambda i: i[FIELDS.index('date_edited')],
                       reverse=reversed)
     elif sort_method == 'done':
         return sorted(sorted_stickies, key=lambda i: i[FIELDS.index('done')],
@@ -41,8 +44,24 @@ def sort_by(sort_method: str, stickies: DB_VALUES, reversed: bool) -> DB_VALUES:
         raise ValueError(f"Sory by `{sort_method}` does not exist")
 
 
+def fetch_sorted(db_model: Model, sort_method: str, reversed: bool,
+                 limit: int | None = None, offset: int = 0) -> DB_VALUES:
+    """Same ordering as `sort_by` but done by sqlite, and optionally only one page
+    """
+    return db_model.fetch_page(sort_method, is_descending(sort_method, reversed), limit, offset)
+
+
+def is_descending(sort_method: str, reversed: bool) -> bool:
+    """Wheather `fetch_sorted` orders `sort_method` (and then `id`) descending
+    """
+    if sort_method not in FIELDS:
+        raise ValueError(f"Sory by `{sort_method}` does not exist")
+    return not reversed if sort_method == 'done' else reversed
+
+
 def sanitize_entry(entry: str) -> str:
-    return entry.strip().replace("'", "''")
+    # Values are bound as parameters by `Model`, no quoting is needed
+    return entry.strip()
 
 
 def sanitize_command(word: str, chars: tuple[str] = ('`',)) -> str:
@@ -54,5 +73,14 @@ def sanitize_command(word: str, chars: tuple[str] = ('`',)) -> str:
     return ''.join(fixed)
 
 
-def get_total(db_model: Model) -> int:
-    return len(db_model.fetch_all())
+def get_total(db_model: Model, done: int | None = None, priority: int | None = None) -> int:
+    """Total stickies, optionally only the ones with the given `done`/`priority`.
+    Read from the counters kept by the `add_totals` migration, not by counting rows
+    """
+    where = {
+        field: value for (field, value) in (('done', done), ('priority', priority))
+        if value is not None
+    }
+    conditions = ' AND '.join(f"{field}=?" for field in where) or '1'
+    query = f"SELECT COALESCE(SUM(total), 0) FROM {db_model.name}_totals WHERE {conditions}"
+    return db_model.execute(query, True, tuple(where.values()))[0][0]
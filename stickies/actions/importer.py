@@ -0,0 +1,73 @@
+from __future__ import annotations
+import csv
+import json
+from pathlib import Path
+from itertools import islice
+from typing import (
+    Generator,
+    Iterable,
+    Iterator,
+    Dict,
+    List,
+    Any,
+)
+
+RECORD = Dict[str, Any]
+CHUNK_SIZE = 1000
+SUPPORTED_FORMATS = ('.json', '.csv', '.ndjson', '.jsonl')
+
+
+def _read_json(file: Path) -> Generator[RECORD, None, None]:
+    with open(file, mode='r') as f:
+        yield from json.load(f)
+
+
+class InvalidRecord(ValueError):
+    """Stands for a record that could not be parsed, the records after it
+    are still read
+    """
+
+
+def _read_ndjson(file: Path) -> Generator[RECORD | InvalidRecord, None, None]:
+    with open(file, mode='r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield InvalidRecord(f"Not valid json: {e}")
+
+
+def _read_csv(file: Path) -> Generator[RECORD, None, None]:
+    with open(file, mode='r', newline='') as f:
+        yield from csv.DictReader(f)
+
+
+def read_records(file: Path) -> Iterator[RECORD | InvalidRecord]:
+    """Stream the records of a file one by one. The format is picked
+    by the file's suffix (see `SUPPORTED_FORMATS`). Every record is a dict
+    with (at least) `title`, `content` and `priority`
+
+    :param file: The file to read from
+    :type file: Path
+    :raises ValueError: If the format of the file is not supported
+    :return: The records of the file, the ones that could not be parsed as `InvalidRecord`
+    :rtype: Iterator[RECORD | InvalidRecord]
+    """
+    readers = {
+        '.json': _read_json,
+        '.csv': _read_csv,
+        '.ndjson': _read_ndjson,
+        '.jsonl': _read_ndjson,
+    }
+    suffix = Path(file).suffix.lower()
+    if suffix not in readers:
+        raise ValueError(f"Unsupported format `{suffix}`. Use one of {SUPPORTED_FORMATS}")
+    return readers[suffix](Path(file))
+
+
+def chunked(iterable: Iterable[Any], size: int) -> Generator[List[Any], None, None]:
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
@@ -0,0 +1,110 @@
+"""Schema changes of the notes table, in the order they were introduced.
+New migrations are appended to `MIGRATIONS`, never inserted or removed,
+since a database's `PRAGMA user_version` is an index into this tuple
+"""
+from models import Model
+from models.model import Migration
+from typing import Tuple
+
+INDEXED_FIELDS = ('done', 'priority', 'date_created', 'date_edited')
+
+
+def _epoch(field: str) -> str:
+    """SQL expression that converts a `dd/mm/YYYY` local date to epoch seconds.
+    Values that are already numbers are kept as they are
+    """
+    iso = f"substr({field}, 7, 4) || '-' || substr({field}, 4, 2) || '-' || substr({field}, 1, 2)"
+    return f"""CASE WHEN typeof({field}) = 'text'
+        THEN CAST(strftime('%s', {iso}, 'utc') AS INTEGER)
+        ELSE {field} END"""
+
+
+def add_indexes(model: Model) -> None:
+    """Index the columns used to filter and sort the stickies
+    """
+    for field in INDEXED_FIELDS:
+        model.execute(
+            f"CREATE INDEX IF NOT EXISTS {model.name}_{field}_idx ON {model.name} ({field})"
+        )
+
+
+def dates_to_epoch(model: Model) -> None:
+    """Store `date_created`/`date_edited` as INTEGER epoch seconds instead of
+    `dd/mm/YYYY` text. SQLite cannot change a column's type, so the table is
+    rebuilt, converting the existing rows, and its indexes are re-created
+    """
+    model.execute(f"""
+    CREATE TABLE {model.name}_new (
+        title TEXT type UNIQUE,
+        content TEXT,
+        priority INTEGER,
+        date_created INTEGER,
+        date_edited INTEGER,
+        done INTEGER,
+        id INTEGER PRIMARY KEY
+    )
+    """)
+    model.execute(f"""
+    INSERT INTO {model.name}_new
+    SELECT title, content, priority, {_epoch('date_created')}, {_epoch('date_edited')}, done, id
+    FROM {model.name}
+    """)
+    model.execute(f"DROP TABLE {model.name}")
+    model.execute(f"ALTER TABLE {model.name}_new RENAME TO {model.name}")
+    add_indexes(model)
+
+
+def add_totals(model: Model) -> None:
+    """Keep a count of the stickies per (done, priority) in `<table>_totals`,
+    maintained by triggers, so any total is a sum over a handful of rows
+    """
+    totals = f"{model.name}_totals"
+    model.execute(f"""
+    CREATE TABLE {totals} (
+        done INTEGER,
+        priority INTEGER,
+        total INTEGER NOT NULL,
+        PRIMARY KEY (done, priority)
+    )
+    """)
+    model.execute(f"""
+    INSERT INTO {totals}
+    SELECT done, priority, COUNT(*) FROM {model.name} GROUP BY done, priority
+    """)
+
+    increment = f"""
+        INSERT INTO {totals} (done, priority, total) VALUES (NEW.done, NEW.priority, 1)
+        ON CONFLICT (done, priority) DO UPDATE SET total = total + 1;"""
+    decrement = f"""
+        UPDATE {totals} SET total = total - 1
+        WHERE done = OLD.done AND priority = OLD.priority;"""
+    model.execute(f"""
+    CREATE TRIGGER {totals}_insert AFTER INSERT ON {model.name}
+    BEGIN {increment}
+    END
+    """)
+    model.execute(f"""
+    CREATE TRIGGER {totals}_delete AFTER DELETE ON {model.name}
+    BEGIN {decrement}
+    END
+    """)
+    model.execute(f"""
+    CREATE TRIGGER {totals}_update AFTER UPDATE OF done, priority ON {model.name}
+    WHEN OLD.done IS NOT NEW.done OR OLD.priority IS NOT NEW.priority
+    BEGIN {decrement} {increment}
+    END
+    """)
+
+
+def add_search_index(model: Model) -> None:
+    """Full-text index over the title and content of the stickies
+    """
+    model.create_search_index('title', 'content')
+
+
+MIGRATIONS: Tuple[Migration, ...] = (
+    add_indexes,
+    dates_to_epoch,
+    add_totals,
+    add_search_index,
+)
@@ -0,0 +1,105 @@
+"""The operations that change the stickies, shared by the cli and the
+window so that both run them in-process against the same `Model`.
+Titles are expected already sanitized (see `dbapi.sanitize_entry`)
+"""
+from __future__ import annotations
+import time
+from models import Model
+from notes.note import Note
+from actions.dbapi import get_total
+from typing import List
+
+
+def add(model: Model, title: str, content: str, priority: int) -> int:
+    """Validate and save a new sticky
+
+    :raises StickyCreationError: If a value is invalid for a `Note`
+    :raises sqlite3.IntegrityError: If a sticky with this title already exists
+    :return: The id of the new sticky
+    :rtype: int
+    """
+    n = Note(title, content, priority)
+    return model.insert(
+        title=n.title,
+        content=n.content,
+        priority=n.priority,
+        date_created=n.date_created,
+        date_edited=n.date_created,
+        done=n.done,
+    )
+
+
+def _find(model: Model, title: str) -> int | None:
+    row = model.select('title', title)
+    return model.filter_row(row, 'id') if row else None
+
+
+def edit(model: Model, title: str, content: str | None = None,
+         priority: int | None = None) -> int | None:
+    """Change the content and/or the priority of a sticky
+
+    :return: The id of the sticky or None if there is no sticky with this title
+    :rtype: int | None
+    """
+    values = {}
+    if content is not None:
+        values['content'] = content
+    if priority is not None:
+        values['priority'] = priority
+    with model.transaction():
+        id = _find(model, title)
+        if id is not None:
+            model.edit('id', id, date_edited=int(time.time()), **values)
+    return id
+
+
+def remove(model: Model, title: str) -> int | None:
+    """Delete a sticky
+
+    :return: The id of the deleted sticky or None if there was no such sticky
+    :rtype: int | None
+    """
+    with model.transaction():
+        id = _find(model, title)
+        if id is not None:
+            model.delete('id', id)
+    return id
+
+
+def set_done(model: Model, title: str, done: bool) -> int | None:
+    """Mark a sticky as done or not done
+
+    :return: The id of the sticky or None if there is no sticky with this title
+    :rtype: int | None
+    """
+    with model.transaction():
+        id = _find(model, title)
+        if id is not None:
+            model.edit('id', id, done=int(done))
+    return id
+
+
+def clear_done(model: Model) -> List[int]:
+    """Delete every sticky that is marked as done
+
+    :return: The ids of the deleted stickies
+    :rtype: List[int]
+    """
+    with model.transaction():
+        ids = [id for (id,) in model.execute(
+            f"SELECT id FROM {model.name} WHERE done=1", True
+        )]
+        model.delete('done', 1)
+    return ids
+
+
+def purge(model: Model) -> int:
+    """Delete every sticky
+
+    :return: How many stickies were deleted
+    :rtype: int
+    """
+    with model.transaction():
+        total = get_total(model)
+        model.execute(f"DELETE FROM {model.name}")
+    return total
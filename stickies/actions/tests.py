@@ -0,0 +1,126 @@
+import os
+import unittest
+from . import services
+from models import Model
+from sqlite3 import IntegrityError
+from .migrations import MIGRATIONS
+from notes.note import (
+    Note,
+    StickyCreationError,
+)
+from .dbapi import (
+    format_date,
+    get_total,
+)
+
+
+BASE_DIR = f'{os.sep}'.join(__file__.split(os.sep)[:-1])
+NOTES_TABLE = {
+    'title': 'TEXT type UNIQUE',
+    'content': 'TEXT',
+    'priority': 'INTEGER',
+    'date_created': 'INTEGER',
+    'date_edited': 'INTEGER',
+    'done': 'INTEGER',
+}
+
+
+class TestMigrations(unittest.TestCase):
+    def setUp(self) -> None:
+        legacy = dict(NOTES_TABLE, date_created='TEXT', date_edited='TEXT')
+        self.legacy = Model('test_migrations', BASE_DIR, **legacy)
+        self.legacy.create_table()
+        self.legacy.insert(title='old', content='content', priority=2,
+                           date_created='05/03/2023', date_edited='17/10/2026', done=1)
+        self.legacy.close()
+        self.model = Model('test_migrations', BASE_DIR, **NOTES_TABLE)
+
+    def tearDown(self) -> None:
+        self.model.close()
+        os.remove(self.model.db)
+
+    def test_migrate(self):
+        self.assertEqual(self.model.migrate(MIGRATIONS), len(MIGRATIONS))
+        self.assertEqual(self.model.migrate(MIGRATIONS), len(MIGRATIONS))
+
+    def test_dates_to_epoch(self):
+        self.model.migrate(MIGRATIONS)
+        row = self.model.select('title', 'old')
+        date_created = self.model.filter_row(row, 'date_created')
+        date_edited = self.model.filter_row(row, 'date_edited')
+        self.assertIsInstance(date_created, int)
+        self.assertEqual(format_date(date_created)[:10], '05/03/2023')
+        self.assertEqual(format_date(date_edited)[:10], '17/10/2026')
+        self.assertEqual(self.model.filter_row(row, 'done'), 1)
+
+    def test_totals(self):
+        self.model.migrate(MIGRATIONS)
+        self.assertEqual(get_total(self.model), 1)
+        self.model.insert_many(
+            {'title': f'note{i}', 'content': '', 'priority': i % 5 + 1,
+             'date_created': 0, 'date_edited': 0, 'done': i % 2}
+            for i in range(20)
+        )
+        self.model.edit('title', 'note0', done=1, priority=5)
+        self.model.delete('title', 'note1')
+
+        self.assertEqual(get_total(self.model), self.model.count())
+        self.assertEqual(get_total(self.model, done=1), self.model.count({'done': 1}))
+        for priority in range(1, 6):
+            self.assertEqual(get_total(self.model, priority=priority),
+                             self.model.count({'priority': priority}))
+        self.assertEqual(get_total(self.model, done=0, priority=3),
+                         self.model.count({'done': 0, 'priority': 3}))
+
+    def test_indexes(self):
+        self.model.migrate(MIGRATIONS)
+        plan = self.model.execute(
+            f"EXPLAIN QUERY PLAN SELECT * FROM {self.model.name} WHERE done=1", True
+        )
+        self.assertIn('USING INDEX', plan[0][-1])
+
+
+class TestServices(unittest.TestCase):
+    def setUp(self) -> None:
+        self.model = Model('test_services', BASE_DIR, **NOTES_TABLE)
+        self.model.create_table()
+        self.model.migrate(MIGRATIONS)
+
+    def tearDown(self) -> None:
+        self.model.close()
+        os.remove(self.model.db)
+
+    def test_add(self):
+        id = services.add(self.model, 'title', 'content', 3)
+        self.assertEqual(self.model.fetch_last('id'), id)
+        with self.assertRaises(IntegrityError):
+            services.add(self.model, 'title', 'other', 1)
+        with self.assertRaises(StickyCreationError):
+            services.add(self.model, 'other', 'content', Note.MAX_PRIORITY + 1)
+        self.assertEqual(get_total(self.model), 1)
+
+    def test_edit(self):
+        id = services.add(self.model, 'title', 'content', 3)
+        self.assertEqual(services.edit(self.model, 'title', priority=5), id)
+        self.assertIsNone(services.edit(self.model, 'missing', 'content'))
+        row = self.model.select('id', id)
+        self.assertEqual(self.model.filter_row(row, 'content'), 'content')
+        self.assertEqual(self.model.filter_row(row, 'priority'), 5)
+
+    def test_remove(self):
+        id = services.add(self.model, 'title', 'content', 3)
+        self.assertIsNone(services.remove(self.model, 'missing'))
+        self.assertEqual(services.remove(self.model, 'title'), id)
+        self.assertEqual(get_total(self.model), 0)
+
+    def test_done(self):
+        ids = [services.add(self.model, f'title{i}', 'content', 1) for i in range(4)]
+        self.assertEqual(services.set_done(self.model, 'title0', True), ids[0])
+        services.set_done(self.model, 'title1', True)
+        services.set_done(self.model, 'title1', False)
+        services.set_done(self.model, 'title2', True)
+        self.assertIsNone(services.set_done(self.model, 'missing', True))
+
+        self.assertEqual(sorted(services.clear_done(self.model)), [ids[0], ids[2]])
+        self.assertEqual(services.purge(self.model), 2)
+        self.assertEqual(get_total(self.model), 0)
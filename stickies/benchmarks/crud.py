@@ -0,0 +1,212 @@
+#!/bin/env python3
+"""Time the db operations of `models.Model` and `actions.dbapi` on
+synthetic dbs of every `--sizes` (1k, 100k and 1M stickies by default).
+
+The dbs have the schema and migrations of `stickies.py` (indexes, totals
+and search index included). The operations that touch a single sticky
+are timed over `--ops` random stickies. For each operation the suite
+reports the throughput and the peak of memory allocated by python
+(`tracemalloc`, measured in a seperate run so it doesn't skew the timing).
+
+    python benchmarks/crud.py [--sizes 1000 100000] [--output file]
+    python benchmarks/crud.py --compare before.json after.json
+"""
+import sys
+import json
+import random
+import sqlite3
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from time import perf_counter
+from pathlib import Path
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Any,
+)
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+from models import Model  # noqa: E402
+from actions.migrations import MIGRATIONS  # noqa: E402
+from actions.dbapi import (  # noqa: E402
+    FIELDS,
+    sort_by,
+    get_total,
+    fetch_sorted,
+)
+
+# Same as `stickies.py`
+NOTES_TABLE = {
+    'title': 'TEXT type UNIQUE',
+    'content': 'TEXT',
+    'priority': 'INTEGER',
+    'date_created': 'INTEGER',
+    'date_edited': 'INTEGER',
+    'done': 'INTEGER',
+}
+SIZES = (1_000, 100_000, 1_000_000)
+WORDS = (
+    'buy', 'milk', 'call', 'mom', 'fix', 'bug', 'review', 'report', 'water',
+    'plants', 'book', 'flight', 'pay', 'rent', 'read', 'paper', 'gym', 'meeting',
+)
+SEARCHES = ('milk', 'fix bug', 'rev', 'pay rent')
+PAGE_SIZE = 100
+# Benchmark name -> (operation, how many times it's timed)
+Benchmarks = Dict[str, tuple]
+
+
+def note(i: int, rng: random.Random) -> Dict[str, Any]:
+    created = 1_600_000_000 + rng.randrange(100_000_000)
+    return {
+        'title': f"note {i}",
+        'content': ' '.join(rng.choices(WORDS, k=6)),
+        'priority': rng.randint(1, 5),
+        'date_created': created,
+        'date_edited': created + rng.randrange(1_000_000),
+        'done': rng.randint(0, 1),
+    }
+
+
+def create(directory: str, size: int, seed: int) -> Model:
+    rng = random.Random(seed)
+    model = Model(f"bench_{size}", directory, **NOTES_TABLE)
+    model.create_table()
+    model.migrate(MIGRATIONS)
+    model.insert_many(note(i, rng) for i in range(size))
+    return model
+
+
+def benchmarks(model: Model, size: int, ops: int, seed: int) -> Benchmarks:
+    """The operations to time. Each one gets the index of the call (one more
+    call than timed is made, for the memory)
+    """
+    rng = random.Random(seed)
+    ids = rng.sample(range(1, size + 1), min(size, ops + 1))
+    # Deleted stickies must not be reused by the other operations
+    deleted = ids[:len(ids) // 2]
+    kept = ids[len(ids) // 2:] or ids
+    stickies = model.fetch_all()
+    new = [note(size + i, rng) for i in range(ops + 1)]
+
+    def pick(i: int) -> int:
+        return kept[i % len(kept)]
+
+    suite = {
+        'insert': (lambda i: model.insert(**new[i]), ops),
+        'fetch_all': (lambda i: model.fetch_all(), 1),
+        'select title': (lambda i: model.select('title', f"note {pick(i) - 1}"), ops),
+        'select id': (lambda i: model.select('id', pick(i)), ops),
+        'edit': (lambda i: model.edit('id', pick(i), content=f"edited {i}"), ops),
+        'get_total': (lambda i: get_total(model), ops),
+        'get_total done': (lambda i: get_total(model, done=i % 2), ops),
+    }
+    for query in SEARCHES:
+        suite[f"search `{query}`"] = (lambda i, query=query: model.search(query, limit=50), 10)
+    for key in FIELDS:
+        suite[f"sort_by {key}"] = (lambda i, key=key: sort_by(key, stickies, False), 1)
+        suite[f"fetch_sorted {key}"] = (
+            lambda i, key=key: fetch_sorted(model, key, False, PAGE_SIZE, size // 2), 10
+        )
+    suite['delete'] = (lambda i: model.delete('id', deleted[i % len(deleted)]), len(deleted) - 1)
+    return suite
+
+
+def timed(operation: Callable[[int], Any], calls: int) -> Dict[str, float]:
+    start = perf_counter()
+    for i in range(calls):
+        operation(i)
+    seconds = perf_counter() - start
+
+    tracemalloc.start()
+    operation(calls)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'calls': calls,
+        'seconds': seconds,
+        'per_second': calls / seconds if seconds else float('inf'),
+        'peak_kib': peak / 1024,
+    }
+
+
+def run(sizes: List[int], ops: int, seed: int) -> Dict[str, Any]:
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            start = perf_counter()
+            model = create(directory, size, seed)
+            populate = perf_counter() - start
+            results[str(size)] = {
+                'insert_many': {'calls': size, 'seconds': populate,
+                                'per_second': size / populate, 'peak_kib': None},
+            }
+            with model:
+                for (name, (operation, calls)) in benchmarks(model, size, ops, seed).items():
+                    results[str(size)][name] = timed(operation, max(calls, 1))
+                    print(f"{size:>9} {name:<24} {results[str(size)][name]['per_second']:12.1f}/s",
+                          file=sys.stderr)
+    return results
+
+
+def metadata() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=APP_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+    }
+
+
+def compare(before: Dict[str, Any], after: Dict[str, Any]) -> None:
+    """Print how many times faster (>1) or slower (<1) every operation got
+    """
+    print(f"{before['meta']['commit']} -> {after['meta']['commit']}")
+    for (size, operations) in after['results'].items():
+        for (name, result) in operations.items():
+            old = before['results'].get(size, {}).get(name)
+            if old is None:
+                continue
+            print(f"{size:>9} {name:<24} {result['per_second'] / old['per_second']:6.2f}x")
+
+
+def main(args: list) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the db operations")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help="stickies per db")
+    parser.add_argument('--ops', type=int, default=1000,
+                        help="how many stickies the single sticky operations touch")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="save the results as json (default: stdout)")
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help="compare the json results of two runs")
+    options = parser.parse_args(args[1:])
+
+    if options.compare:
+        before, after = (json.loads(Path(file).read_text()) for file in options.compare)
+        compare(before, after)
+        return 0
+
+    report = {
+        'meta': metadata(),
+        'results': run(options.sizes, options.ops, options.seed),
+    }
+    if options.output:
+        Path(options.output).write_text(json.dumps(report, indent=4))
+    else:
+        print(json.dumps(report, indent=4))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
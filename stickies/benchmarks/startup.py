@@ -0,0 +1,195 @@
+#!/bin/env python3
+"""Measure how long `stickies.py` takes to start, per entry path.
+
+Every path runs in a fresh interpreter against a copy of the app (so the
+real db and config are never touched):
+    * cold: the first run, without any bytecode cache
+    * warm: the median of the runs that follow
+The imports of each path are broken down with `-X importtime`.
+
+Exits with 1 when a path is slower than its budget (`BUDGETS`, or the
+`--baseline` of a previous `--output` plus `--tolerance`), or when the cli
+imports a module it should not (`CLI_FORBIDDEN`).
+
+    python benchmarks/startup.py [-n runs] [--notes count] [--output file]
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+from time import perf_counter
+from pathlib import Path
+from typing import (
+    Dict,
+    List,
+    Tuple,
+)
+
+APP_DIR = Path(__file__).resolve().parent.parent
+# Name of the path -> arguments of `stickies.py`
+CLI_PATHS = {
+    'cli get_total': ('get_total',),
+    'cli show_all': ('show_all', '-l', '20'),
+    'cli search': ('search', '-q', 'title'),
+    'cli help': ('help',),
+}
+GUI_PATH = 'gui'
+# The window shown (offscreen) with its first page loaded, then exit
+GUI_SNIPPET = """
+import stickies
+from PyQt5.QtWidgets import QApplication
+from window.window import Stickies
+app = QApplication([])
+ui = Stickies(stickies.model, stickies.logger, stickies.configs)
+ui.show()
+app.processEvents()
+ui.dispatcher.wait()
+app.processEvents()
+"""
+# Warm start budgets in milliseconds
+BUDGETS = {
+    **{path: 300 for path in CLI_PATHS},
+    GUI_PATH: 2000,
+}
+CLI_FORBIDDEN = ('PyQt5',)
+IGNORED = shutil.ignore_patterns('__pycache__', '.notes.sqlite', '.config.json*', '.stickies.sock',
+                                 '.shell_history', 'benchmarks')
+
+
+def command(path: str) -> List[str]:
+    if path == GUI_PATH:
+        return [sys.executable, '-c', GUI_SNIPPET]
+    return [sys.executable, 'stickies.py', *CLI_PATHS[path]]
+
+
+def run(app: Path, path: str, importtime: bool = False) -> Tuple[float, str]:
+    """Run an entry path once
+
+    :return: The wall time in milliseconds and stderr
+    :rtype: Tuple[float, str]
+    """
+    args = command(path)
+    if importtime:
+        args.insert(1, '-Ximporttime')
+    env = {**os.environ, 'QT_QPA_PLATFORM': 'offscreen', 'COLUMNS': '80'}
+    start = perf_counter()
+    done = subprocess.run(args, cwd=app, env=env, stdin=subprocess.DEVNULL,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = (perf_counter() - start) * 1000
+    if done.returncode != 0:
+        raise RuntimeError(f"`{path}` exited with {done.returncode}:\n{done.stderr}")
+    return elapsed, done.stderr
+
+
+def parse_importtime(stderr: str) -> Dict[str, Tuple[int, int]]:
+    """Parse the output of `-X importtime`
+
+    :return: The (self, cumulative) microseconds of every imported module
+    :rtype: Dict[str, Tuple[int, int]]
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        if not own.strip().isnumeric():  # The header
+            continue
+        modules[name.strip()] = (int(own), int(cumulative))
+    return modules
+
+
+def seed(app: Path, notes: int) -> None:
+    """Fill the db of the copy through the `import` command
+    """
+    file = app / 'seed.ndjson'
+    with open(file, mode='w') as f:
+        for i in range(notes):
+            record = {'title': f"title {i}", 'content': f"content {i}", 'priority': i % 5 + 1}
+            f.write(f"{json.dumps(record)}\n")
+    subprocess.run([sys.executable, 'stickies.py', 'import', '-f', str(file)], cwd=app,
+                   stdout=subprocess.DEVNULL, check=True)
+    file.unlink()
+
+
+def measure(app: Path, path: str, runs: int, top: int) -> dict:
+    for cache in app.rglob('__pycache__'):
+        shutil.rmtree(cache)
+    cold, _ = run(app, path)
+    warm = [run(app, path)[0] for _ in range(runs)]
+    modules = parse_importtime(run(app, path, importtime=True)[1])
+    slowest = sorted(modules.items(), key=lambda i: i[1][0], reverse=True)[:top]
+    return {
+        'cold': cold,
+        'warm': statistics.median(warm),
+        'warm_min': min(warm),
+        'imports': {name: own for (name, (own, _)) in slowest},
+        'modules': sorted(modules),
+    }
+
+
+def check(results: dict, budgets: Dict[str, float]) -> List[str]:
+    failures = []
+    for (path, result) in results.items():
+        if result['warm'] > budgets[path]:
+            failures.append(f"{path}: {result['warm']:.0f}ms > {budgets[path]:.0f}ms")
+        if path != GUI_PATH:
+            for module in result['modules']:
+                if module.split('.')[0] in CLI_FORBIDDEN:
+                    failures.append(f"{path}: imports `{module}`")
+                    break
+    return failures
+
+
+def report(results: dict) -> None:
+    for (path, result) in results.items():
+        print(f"{path:<16} cold: {result['cold']:7.1f}ms  warm: {result['warm']:7.1f}ms "
+              f"(min {result['warm_min']:.1f}ms)")
+        for (name, own) in result['imports'].items():
+            print(f"    {own / 1000:7.1f}ms  {name}")
+
+
+def main(args: list) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the startup of stickies.py")
+    parser.add_argument('-n', '--runs', type=int, default=10, help="warm runs per path")
+    parser.add_argument('--notes', type=int, default=1000, help="stickies in the db")
+    parser.add_argument('--top', type=int, default=8, help="slowest imports to show")
+    parser.add_argument('--no-gui', action='store_true', help="skip the gui path")
+    parser.add_argument('--output', help="save the results as json")
+    parser.add_argument('--baseline', help="results of a previous run to compare with")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="allowed slowdown over the baseline (default: 0.2, 20%%)")
+    options = parser.parse_args(args[1:])
+
+    paths = list(CLI_PATHS) if options.no_gui else [*CLI_PATHS, GUI_PATH]
+    budgets = dict(BUDGETS)
+    if options.baseline:
+        with open(options.baseline) as f:
+            baseline = json.load(f)
+        budgets.update({
+            path: result['warm'] * (1 + options.tolerance)
+            for (path, result) in baseline.items() if path in budgets
+        })
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = Path(directory) / 'stickies'
+        shutil.copytree(APP_DIR, app, ignore=IGNORED)
+        seed(app, options.notes)
+        results = {path: measure(app, path, options.runs, options.top) for path in paths}
+
+    report(results)
+    if options.output:
+        with open(options.output, mode='w') as f:
+            json.dump(results, f, indent=4)
+
+    failures = check(results, budgets)
+    for failure in failures:
+        print(f"FAILED {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -1,21 +1,45 @@
-import os
+import sys
+import shlex
+import shutil
 import models
 import logger
 import sqlite3
-import datetime
 import jsonwrapper
 from enum import Enum
-from notes.note import Note
+from pathlib import Path
+from contextlib import nullcontext
 from logger import get_color
+from actions import importer
+from actions import services
+from actions.constants import WORKING_DIR
+from notes.note import (
+    Note,
+    StickyCreationError,
+)
 from actions.dbapi import (
     sanitize_entry,
+    format_date,
     get_total,
-    sort_by,
+    fetch_sorted,
 )
 
 
 # Holds the ammount of documents printed in `help_text` to keep them always synced
 len_docs = -1
+# Stands for a line as wide as the terminal, which is measured only when
+# the help is printed (and falls back to 80 columns when not in a terminal)
+LINE = '\0'
+# Stickies per page of `show_all` when a page is requested without a limit
+PAGE_SIZE = 20
+# Commands of `batch` commited at once, when no chunk size is given
+BATCH_SIZE = 500
+# Commands that can't run inside a `batch`
+NESTED = ('batch', 'shell', 'serve')
+# The header and color of a sticky, by its `done`
+DONE_MARKS = {
+    True: ('✔', get_color('green')),
+    False: ('✘', get_color('red')),
+}
 
 
 class HelpTags(Enum):
@@ -26,6 +50,40 @@ class HelpTags(Enum):
     Description:
         Adds a new sticky note to your collection"""
 
+    import_help = """
+    Command: import
+    Params:
+        -f <file>
+    Optional:
+        -s <chunk-size>
+    Description:
+        Add all the stickies of a .json, .csv or .ndjson file"""
+
+    batch_help = """
+    Command: batch
+    Optional:
+        -f <file> -s <chunk-size>
+    Description:
+        Run the commands of a file (or stdin), one per line and written
+        like on the command line (eg. add -t title -c content -p 1).
+        They are commited every `chunk-size` commands"""
+
+    shell_help = """
+    Command: shell
+    Params:
+        None
+    Description:
+        Start an interactive shell that runs the commands above (without
+        `stickies.py`), with history and completion of titles (after -t)"""
+
+    serve_help = """
+    Command: serve
+    Params:
+        None
+    Description:
+        Run a daemon that owns the db, until it's interrupted. While it runs,
+        every other command (but `shell`) is sent to it and runs there"""
+
     help_remove = """
     Command: remove
     Params:
@@ -70,12 +128,23 @@ class HelpTags(Enum):
     Description:
         Set a sticky to `undone`"""
 
+    search_help = """
+    Command: search
+    Params:
+        -q <query>
+    Optional:
+        -f <field,field> -l <limit>
+    Description:
+        Find the stickies matching the words of `query`, best matches first"""
+
     show_all_help = """
     Command: show_all
     Params:
         -r <reverse>
+    Optional:
+        -l <limit> -pg <page>
     Description:
-        Get a list of all your stickies"""
+        Get a list of all your stickies, `limit` at a time"""
 
     clear_done_help = """
     Command: clear_done
@@ -130,13 +199,25 @@ def lines(count: bool = True):
     global len_docs
     if count:
         len_docs += 1
-    return '-' * os.get_terminal_size().columns
+    return LINE
+
+
+def print_help():
+    print(help_text.replace(LINE, '-' * shutil.get_terminal_size().columns))
 
 
 help_text = f"""{get_color('yellow')}
 {lines()}
 {HelpTags.help_add.value}
 {lines()}
+{HelpTags.import_help.value}
+{lines()}
+{HelpTags.batch_help.value}
+{lines()}
+{HelpTags.shell_help.value}
+{lines()}
+{HelpTags.serve_help.value}
+{lines()}
 {HelpTags.help_remove.value}
 {lines()}
 {HelpTags.purge_all_help.value}
@@ -155,6 +236,8 @@ help_text = f"""{get_color('yellow')}
 {lines()}
 {HelpTags.show_all_help.value}
 {lines()}
+{HelpTags.search_help.value}
+{lines()}
 {HelpTags.config_restore_help.value}
 {lines()}
 {HelpTags.config_all_help.value}
@@ -193,20 +276,21 @@ class CliInterface(metaclass=MetaInterface):
         self.handler = handler
 
     def _print_sticky(self, id, title, content, priority, date_created, date_edited, done):
-        attr = {
-            True: ('✔', get_color('green')),
-            False: ('✘', get_color('red')),
-        }
+        if not self.logger.enabled('custom'):
+            return
+        created, edited = format_date(date_created), format_date(date_edited)
 
         self.logger.custom(
             f"{id = }, {title = }, {content = },\
- {priority = }, {date_created = }, {date_edited = }",
-            attr[done][0],
-            attr[done][1],
+ {priority = }, date_created = {created!r}, date_edited = {edited!r}",
+            DONE_MARKS[done][0],
+            DONE_MARKS[done][1],
+            id=id, title=title, content=content, priority=priority,
+            date_created=date_created, date_edited=date_edited, done=done,
         )
 
     def _print_config(self, key, value):
-        self.logger.custom(f'{key} -> {value}', 'CONFIG', get_color('cyan'))
+        self.logger.custom(f'{key} -> {value}', 'CONFIG', get_color('cyan'), key=key, value=value)
 
     def add(self):
         try:
@@ -217,48 +301,159 @@ class CliInterface(metaclass=MetaInterface):
                     int(self.params['-p'])
                 )
 
-                n = Note(
+                services.add(
+                    self.model,
                     sanitize_entry(title),
                     sanitize_entry(content),
                     priority,
                 )
-                self.model.insert(
-                    title=n.title,
-                    content=n.content,
-                    priority=n.priority,
-                    date_created=n.date_created,
-                    date_edited=n.date_created,
-                    done=n.done
-                )
-                self.logger.success(f"Sticly `{title}` was added successfully!")
+                self.logger.success(f"Sticly `{title}` was added successfully!", title=title)
             except KeyError:
                 self.logger.error(HelpTags.help_add.value)
         except sqlite3.IntegrityError:
-            self.logger.warning(f"A sticky with the title `{title}` already exists.")
+            self.logger.warning(f"A sticky with the title `{title}` already exists.", title=title)
+
+    def import_notes(self):
+        try:
+            file = Path(WORKING_DIR, self.params['-f'])
+            chunk_size = int(self.params.get('-s', importer.CHUNK_SIZE))
+            records = importer.read_records(file)
+        except KeyError:
+            self.logger.error(HelpTags.import_help.value)
+            return
+        except ValueError as e:
+            self.logger.error(str(e))
+            return
+        if chunk_size < 1:
+            self.logger.error(f"The chunk size must be at least 1\n{HelpTags.import_help.value}")
+            return
+
+        invalid = 0
+
+        def text(record, field):
+            # Missing csv cells are None, json values can be of any type
+            if not isinstance(record[field], str):
+                raise TypeError(f"`{field}` is not text")
+            return sanitize_entry(record[field])
+
+        def rows():
+            nonlocal invalid
+            for line, record in enumerate(records, start=1):
+                try:
+                    if isinstance(record, importer.InvalidRecord):
+                        raise record
+                    n = Note(
+                        text(record, 'title'),
+                        text(record, 'content'),
+                        int(record['priority']),
+                    )
+                    # An empty csv cell
+                    n.done = int(record.get('done') or 0)
+                except (KeyError, ValueError, TypeError, StickyCreationError) as e:
+                    invalid += 1
+                    self.logger.warning(f"Record {line} was skipped: {e}", line=line)
+                    continue
+                yield {
+                    'title': n.title,
+                    'content': n.content,
+                    'priority': n.priority,
+                    'date_created': n.date_created,
+                    'date_edited': n.date_created,
+                    'done': n.done,
+                }
+
+        try:
+            total = inserted = 0
+            for chunk in importer.chunked(rows(), chunk_size):
+                total += len(chunk)
+                inserted += self.model.insert_many(chunk, ignore=True)
+        except (OSError, ValueError) as e:
+            # The chunks before are commited already
+            self.logger.error(f"Could not read `{file}`: {e} ({inserted} stickies were imported\
+ before the error)", file=file, inserted=inserted)
+            return
+        self.logger.success(f"{inserted} stickies were imported from `{file}`\
+ (duplicates: {total - inserted}, invalid: {invalid})", file=file, inserted=inserted,
+                            duplicates=total - inserted, invalid=invalid)
+
+    def batch(self):
+        file = self.params.get('-f', '-')
+        try:
+            chunk_size = int(self.params.get('-s', BATCH_SIZE))
+            # stdin is not closed when done
+            source = nullcontext(sys.stdin) if file == '-' else open(Path(WORKING_DIR, file))
+        except (ValueError, OSError) as e:
+            self.logger.error(f"{e}\n{HelpTags.batch_help.value}")
+            return
+
+        def commands(stream):
+            for (line, text) in enumerate(stream, start=1):
+                text = text.strip()
+                if text and not text.startswith('#'):
+                    yield line, text
+
+        ran = failed = commits = 0
+        with source as stream:
+            for chunk in importer.chunked(commands(stream), max(chunk_size, 1)):
+                with self.model.transaction():
+                    for (line, text) in chunk:
+                        self.logger.context['line'] = line
+                        try:
+                            command, params = parser(['batch', *shlex.split(text)])
+                            if command in NESTED:
+                                raise ValueError(f"`{command}` can't run inside a batch")
+                            # A savepoint, a command that fails leaves no partial writes
+                            with self.model.transaction():
+                                found = dispatch(command, params, self.model, self.logger,
+                                                 self.handler)
+                            if not found:
+                                raise ValueError(f"Unknown command `{command}`")
+                            ran += 1
+                        except Exception as e:
+                            failed += 1
+                            self.logger.error(f"Line {line}: {e}")
+                commits += 1
+        self.logger.context.pop('line', None)
+        self.logger.success(f"{ran} commands were run (failed: {failed}, commits: {commits})",
+                            ran=ran, failed=failed, commits=commits)
+
+    def shell(self):
+        # Only imported (with readline) when needed
+        from cli.shell import Shell
+        Shell(self.model, self.logger, self.handler).cmdloop()
+
+    def serve(self):
+        from cli import daemon
+        try:
+            daemon.serve(self.model, self.logger, self.handler)
+        except RuntimeError as e:
+            self.logger.error(str(e))
+            raise SystemExit(1)
 
     def remove(self):
         try:
             title_org = self.params['-t']
             title = sanitize_entry(title_org)
-            self.model.execute(f"DELETE FROM {self.model.name} WHERE title='{title}'")
-            self.logger.success(f"Sticky `{title_org}` was removed successfully")
+            if services.remove(self.model, title) is None:
+                self.logger.info(f"There is no sticky with the name `{title}`", title=title)
+                return
+            self.logger.success(f"Sticky `{title_org}` was removed successfully", title=title)
         except KeyError:
             self.logger.error(HelpTags.help_remove.value)
 
     def edit(self):
-        date_edited = datetime.datetime.now().strftime("%d/%m/%Y")
         try:
             title = sanitize_entry(self.params['-t'])
             cols = self.params.copy()
 
             del cols['-t']
             if cols:
-                if '-sc' in cols:
-                    self.model.edit(f"content='{sanitize_entry(cols['-sc'])}'", f"title='{title}'")
-                if '-sp' in cols:
-                    self.model.edit(f"priority={int(cols['-sp'])}", f"title='{title}'")
-                self.model.edit(f"date_edited='{date_edited}'", f"title='{title}'")
-                self.logger.success(f"Sticky {title} was edited succesfuly")
+                content = sanitize_entry(cols['-sc']) if '-sc' in cols else None
+                priority = int(cols['-sp']) if '-sp' in cols else None
+                if services.edit(self.model, title, content, priority) is None:
+                    self.logger.info(f"There is no sticky with the name `{title}`", title=title)
+                    return
+                self.logger.success(f"Sticky {title} was edited succesfuly", title=title)
             else:
                 self.logger.info("Not enough arguments to edit")
         except KeyError:
@@ -266,10 +461,10 @@ class CliInterface(metaclass=MetaInterface):
 
     def peek(self):
         try:
-            title = self.params['-t']
-            row = self.model.select('title', f"'{title}'")
+            title = sanitize_entry(self.params['-t'])
+            row = self.model.select('title', title)
             if not row:
-                self.logger.info(f"No sticky with the the `{title}` was found")
+                self.logger.info(f"No sticky with the the `{title}` was found", title=title)
                 return
             id = self.model.filter_row(row, 'id')
             title = self.model.filter_row(row, 'title')
@@ -287,11 +482,10 @@ class CliInterface(metaclass=MetaInterface):
         try:
             title_org = self.params['-t']
             title = sanitize_entry(title_org)
-            if not self.model.select('title', f"'{title}'"):
-                self.logger.info(f"There is no sticky with the name `{title}`")
+            if services.set_done(self.model, title, True) is None:
+                self.logger.info(f"There is no sticky with the name `{title}`", title=title)
                 return
-            self.model.edit('done=1', f"title='{title}'")
-            self.logger.success(f"Sticky `{title_org}` is set to `done`")
+            self.logger.success(f"Sticky `{title_org}` is set to `done`", title=title)
         except KeyError:
             self.logger.error(HelpTags.help_set_done.value)
 
@@ -299,55 +493,68 @@ class CliInterface(metaclass=MetaInterface):
         try:
             title_org = self.params['-t']
             title = sanitize_entry(title_org)
-            if not self.model.select('title', f"'{title}'"):
-                self.logger.info(f"There is no sticky with the name `{title}`")
+            if services.set_done(self.model, title, False) is None:
+                self.logger.info(f"There is no sticky with the name `{title}`", title=title)
                 return
-            self.model.edit('done=0', f"title='{title}'")
-            self.logger.success(f"Sticky `{title_org}` is set to `un-done`")
+            self.logger.success(f"Sticky `{title_org}` is set to `un-done`", title=title)
         except KeyError:
             self.logger.error(HelpTags.help_set_undone.value)
 
     def show_all(self):
         try:
-            rows = self.model.fetch_all()
+            reverse = self.params['-r']
+            page = int(self.params.get('-pg', 1))
+            limit = self.params.get('-l', PAGE_SIZE if '-pg' in self.params else None)
+            limit = None if limit is None else int(limit)
+            offset = (page - 1) * limit if limit is not None else 0
+            rows = fetch_sorted(self.model, self.handler.get('sort_by'),
+                                eval(reverse.title()), limit, max(offset, 0))
             if rows:
-                reverse = self.params['-r']
-                stickies = sort_by(self.handler.get('sort_by'), rows, eval(reverse.title()))
-                for row in stickies:
-                    id = self.model.filter_row([row], 'id')
-                    title = self.model.filter_row([row], 'title')
-                    content = self.model.filter_row([row], 'content')
-                    priority = self.model.filter_row([row], 'priority')
-                    date_created = self.model.filter_row([row], 'date_created')
-                    date_edited = self.model.filter_row([row], 'date_edited')
-                    done = self.model.filter_row([row], 'done')
-
+                for row in rows:
+                    title, content, priority, date_created, date_edited, done, id = row
                     self._print_sticky(id, title, content, priority,
                                        date_created, date_edited, done)
+            elif page > 1:
+                self.logger.info(f"There are no stickies on page {page}", page=page)
             else:
                 self.logger.info("Seems like you've nothing to do!")
-        except KeyError:
+        except (KeyError, ValueError):
             self.logger.error(HelpTags.show_all_help.value)
 
+    def search(self):
+        try:
+            query = self.params['-q']
+            fields = self.params['-f'].split(',') if '-f' in self.params else None
+            limit = int(self.params['-l']) if '-l' in self.params else None
+            rows = self.model.search(query, fields, limit)
+        except (KeyError, ValueError):
+            self.logger.error(HelpTags.search_help.value)
+            return
+
+        if not rows:
+            self.logger.info(f"No sticky matches `{query}`", query=query)
+        for row in rows:
+            title, content, priority, date_created, date_edited, done, id = row
+            self._print_sticky(id, title, content, priority, date_created, date_edited, done)
+
     def clear_done(self):
-        total = self.model.execute(f"SELECT * FROM {self.model.name} WHERE done=1", fetch=True)
-        self.model.execute(f"DELETE FROM {self.model.name} WHERE done=1")
-        self.logger.success(f"All fields set to `done` are deleted. (Total: {len(total)})")
+        total = len(services.clear_done(self.model))
+        self.logger.success(f"All fields set to `done` are deleted. (Total: {total})", total=total)
 
     def purge_all(self):
-        total = self.model.execute(f"SELECT * FROM {self.model.name}", fetch=True)
-        self.model.execute(f"DELETE FROM {self.model.name}")
-        self.logger.warning(f"All fields are purged. (Total: {len(total)})")
+        total = services.purge(self.model)
+        self.logger.warning(f"All fields are purged. (Total: {total})", total=total)
 
     def get_total(self):
-        total = get_total(self.model)
-        self.logger.info(f"Total stickes saved: {total}")
+        total, done = get_total(self.model), get_total(self.model, done=1)
+        self.logger.info(f"Total stickes saved: {total} (done: {done}, not done: {total - done})",
+                         total=total, done=done)
 
     def config_edit(self):
         try:
             key, value, type_ = self.params['-k'], self.params['-v'], self.params['-t']
             self.handler.edit(key, value, eval(type_))
-            self.logger.success(f"`{key}` has been set to {value}")
+            self.logger.success(f"`{key}` has been set to {value}", key=key, value=value)
         except KeyError:
             self.logger.error(HelpTags.config_edit_help.value)
 
@@ -369,35 +576,55 @@ class CliInterface(metaclass=MetaInterface):
                 value = self.handler.get(key)
                 self._print_config(key, value)
             else:
-                self.logger.warning(f"There is no configuration with the name `{key}`")
+                self.logger.warning(f"There is no configuration with the name `{key}`", key=key)
         except KeyError:
             self.logger.error(HelpTags.config_get_help.value)
 
 
+COMMANDS = {
+    # STICKY RELATED
+    'show_all': CliInterface.show_all,
+    'search': CliInterface.search,
+    'clear_done': CliInterface.clear_done,
+    'purge_all': CliInterface.purge_all,
+    'add': CliInterface.add,
+    'import': CliInterface.import_notes,
+    'batch': CliInterface.batch,
+    'shell': CliInterface.shell,
+    'serve': CliInterface.serve,
+    'remove': CliInterface.remove,
+    'edit': CliInterface.edit,
+    'peek': CliInterface.peek,
+    'set_done': CliInterface.set_done,
+    'set_undone': CliInterface.set_undone,
+    'get_total': CliInterface.get_total,
+    # CONFIG RELATED
+    'config_edit': CliInterface.config_edit,
+    'config_restore': CliInterface.config_restore,
+    'config_all': CliInterface.config_all,
+    'config_get': CliInterface.config_get,
+}
+assert len(COMMANDS) == len_docs
+
+
+def dispatch(command: str, params: dict, model: models.Model, logger: logger.Logger,
+             configs: jsonwrapper.Handler) -> bool:
+    """Run a command, without flushing the logger
+
+    :return: False if the command does not exist (nothing was run)
+    :rtype: bool
+    """
+    if command not in COMMANDS:
+        return False
+    COMMANDS[command](CliInterface(params, logger, model, configs))
+    return True
+
+
 def cli(args: list, model: models.Model, logger: logger.Logger, configs: jsonwrapper.Handler):
     command, params = parser(args)
-    interface = CliInterface(params, logger, model, configs)
-
-    commands = {
-        'help': lambda: print(help_text),
-        # STICKY RELATED
-        'show_all': interface.show_all,
-        'clear_done': interface.clear_done,
-        'purge_all': interface.purge_all,
-        'add': interface.add,
-        'remove': interface.remove,
-        'edit': interface.edit,
-        'peek': interface.peek,
-        'set_done': interface.set_done,
-        'set_undone': interface.set_undone,
-        'get_total': interface.get_total,
-        # CONFIG RELATED
-        'config_edit': interface.config_edit,
-        'config_restore': interface.config_restore,
-        'config_all': interface.config_all,
-        'config_get': interface.config_get,
-    }
-
-    assert (len(commands) - 1) == len_docs
-    #                     ^^^ because `help` doesn't exist as an command
-    commands.get(command, commands['help'])()
+    logger.context['command'] = command
+    try:
+        if not dispatch(command, params, model, logger, configs):
+            print_help()
+    finally:
+        logger.flush()
@@ -0,0 +1,196 @@
+"""A daemon (`stickies.py serve`) that owns the db and runs the commands of
+other `stickies.py` processes, which become thin clients of it.
+
+The protocol is one json object per line over a unix socket. A request
+`{"args": ["add", "-t", "title", ...], "columns": 80, "cwd": "/..."}` is
+answered with `{"status": 0, "output": "..."}`, where `output` is everything
+the command printed. Relative files are resolved against `cwd`, the directory
+the client was started from. Requests are served one at a time, so writes never
+contend for the db
+"""
+from __future__ import annotations
+import io
+import os
+import json
+import signal
+import socket
+import models
+import logger
+import shutil
+import jsonwrapper
+import socketserver
+from pathlib import Path
+from cli.cli import cli
+from contextlib import redirect_stdout
+from actions.constants import (
+    WORKING_DIR,
+    BASE_DIR,
+)
+from typing import (
+    Tuple,
+    List,
+    Any,
+)
+
+SOCKET_PATH = Path(f"{BASE_DIR}/.stickies.sock")
+# Commands that need the terminal (or stdin) of the process that runs them
+LOCAL_COMMANDS = ('serve', 'shell')
+# Commands whose `-f` is a file (rather than eg. the fields of `search`)
+FILE_COMMANDS = ('import', 'batch')
+
+
+def _send(connection: socket.socket, message: Any) -> None:
+    connection.sendall(json.dumps(message).encode() + b'\n')
+
+
+def _receive(stream: Any) -> Any:
+    line = stream.readline()
+    if not line:
+        raise ConnectionError("The connection was closed")
+    return json.loads(line)
+
+
+def is_local(args: List[str]) -> bool:
+    """Wheather a command has to run in this process, instead of the daemon
+
+    :param args: The command and its params (without `stickies.py`)
+    :type args: List[str]
+    """
+    if args[0] in LOCAL_COMMANDS:
+        return True
+    return args[0] == 'batch' and _file(args) in (None, '-')  # Reads stdin
+
+
+def _file(args: List[str]) -> str | None:
+    if '-f' not in args[:-1]:
+        return None
+    return args[args.index('-f') + 1]
+
+
+def _resolve(args: List[str], cwd: str) -> List[str]:
+    """The args of a command with its file (if it takes one) relative to `cwd`
+    """
+    file = _file(args)
+    if file is None or args[0] not in FILE_COMMANDS:
+        return args
+    args = list(args)
+    args[args.index('-f') + 1] = os.path.join(cwd, file)  # Kept as is if absolute
+    return args
+
+
+def request(args: List[str], path: Path = SOCKET_PATH) -> Tuple[int, str] | None:
+    """Run a command in the daemon
+
+    :param args: The command and its params (without `stickies.py`)
+    :type args: List[str]
+    :return: The status and the output of the command, None if no daemon is
+        running (or it went away before getting the command)
+    :rtype: Tuple[int, str] | None
+    """
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        # Blocks (rather than failing) while the daemon's backlog is full
+        try:
+            client.connect(str(path))
+            _send(client, {'args': args, 'columns': shutil.get_terminal_size().columns,
+                           'cwd': WORKING_DIR})
+        except (FileNotFoundError, ConnectionError):
+            return None
+        # The command may have run already, so it's not run again here
+        try:
+            with client.makefile('rb') as stream:
+                response = _receive(stream)
+        except (ConnectionError, ValueError) as e:
+            return 1, f"The daemon did not answer, `{args[0]}` may not have run: {e}\n"
+        return response['status'], response['output']
+    finally:
+        client.close()
+
+
+def is_running(path: Path = SOCKET_PATH) -> bool:
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(str(path))
+        return True
+    except (FileNotFoundError, ConnectionRefusedError):
+        return False
+    finally:
+        client.close()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: Server
+
+    def handle(self) -> None:
+        while True:
+            try:
+                message = _receive(self.rfile)
+            except (ConnectionError, ValueError):
+                return
+            args = _resolve(message['args'], message.get('cwd', WORKING_DIR))
+            _send(self.connection, self.server.run(args, message.get('columns')))
+
+
+class Server(socketserver.UnixStreamServer):
+    """Serves the requests of the clients one at a time, with the same
+    (open) db, config and logger
+    """
+    # Clients that wait to be served
+    request_queue_size = 128
+
+    def __init__(self, path: Path, model: models.Model, logger: logger.Logger,
+                 configs: jsonwrapper.Handler) -> None:
+        self.model = model
+        self.logger = logger
+        self.configs = configs
+        super(Server, self).__init__(str(path), _Handler)
+
+    def server_bind(self) -> None:
+        super(Server, self).server_bind()
+        # Commands like `config_edit` run whatever they are given, only the owner may connect
+        os.chmod(self.server_address, 0o600)
+
+    def run(self, args: List[str], columns: int | None = None) -> dict:
+        if not args or is_local(args):
+            return {'status': 1, 'output': f"`{' '.join(args)}` can't run in the daemon\n"}
+        if columns:  # Read by `shutil.get_terminal_size`
+            os.environ['COLUMNS'] = str(columns)
+        # The level may have been changed by the previous request
+        self.logger.settings.level = self.configs.get('quiet')
+
+        output = io.StringIO()
+        status = 0
+        with redirect_stdout(output):
+            try:
+                cli(['stickies.py', *args], self.model, self.logger, self.configs)
+            except Exception as e:
+                status = 1
+                self.logger.error(f"{e.__class__.__name__}: {e}")
+                self.logger.flush()
+        return {'status': status, 'output': output.getvalue()}
+
+
+def serve(model: models.Model, logger: logger.Logger, configs: jsonwrapper.Handler,
+          path: Path = SOCKET_PATH) -> None:
+    """Serve the requests until the daemon is interrupted or terminated
+
+    :raises RuntimeError: If another daemon is running
+    """
+    if is_running(path):
+        raise RuntimeError(f"A daemon is already running at `{path}`")
+    if path.exists():  # Left by a daemon that was killed
+        path.unlink()
+
+    def terminate(*args: Any) -> None:
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, terminate)
+    with Server(path, model, logger, configs) as server:
+        logger.info(f"Serving at `{path}`, stop with ctrl-c")
+        logger.flush()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            path.unlink(missing_ok=True)
@@ -0,0 +1,154 @@
+from __future__ import annotations
+import cmd
+import shlex
+import models
+import logger
+import bisect
+import jsonwrapper
+from pathlib import Path
+from actions.constants import BASE_DIR
+from cli.daemon import (
+    LOCAL_COMMANDS,
+    is_local,
+)
+from cli.cli import (
+    COMMANDS,
+    dispatch,
+    parser,
+    print_help,
+)
+from typing import (
+    Tuple,
+    List,
+)
+try:
+    import readline
+except ImportError:  # Not available on every platform, the shell works without it
+    readline = None
+
+HISTORY_FILE = Path(f"{BASE_DIR}/.shell_history")
+HISTORY_LENGTH = 1000
+EXIT_COMMANDS = ('exit', 'quit')
+
+
+class TitleIndex:
+    """The titles of every sticky, sorted so the ones starting with a prefix
+    are found with a binary search. They are read again only after the db
+    changed (by this connection or by any other)
+    """
+    def __init__(self, model: models.Model) -> None:
+        self.model = model
+        self._titles: List[str] = []
+        self._version: Tuple[int, int] | None = None
+
+    def _current_version(self) -> Tuple[int, int]:
+        connection = self.model.connection
+        data_version = connection.execute('PRAGMA data_version').fetchone()[0]
+        return connection.total_changes, data_version
+
+    def titles(self) -> List[str]:
+        version = self._current_version()
+        if version != self._version:
+            rows = self.model.execute(f"SELECT title FROM {self.model.name} ORDER BY title", True)
+            self._titles = [title for (title,) in rows]
+            self._version = version
+        return self._titles
+
+    def starting_with(self, prefix: str) -> List[str]:
+        titles = self.titles()
+        start = bisect.bisect_left(titles, prefix)
+        end = start
+        while end < len(titles) and titles[end].startswith(prefix):
+            end += 1
+        return titles[start:end]
+
+
+class Shell(cmd.Cmd):
+    """Runs the commands of `cli` (eg. `add -t title -c content -p 1`) against
+    the same, already open, db until `exit`
+    """
+    intro = "Stickies shell. Type `help` for the commands and `exit` to leave"
+    prompt = 'stickies> '
+
+    def __init__(self, model: models.Model, logger: logger.Logger,
+                 configs: jsonwrapper.Handler) -> None:
+        super(Shell, self).__init__()
+        self.model = model
+        self.logger = logger
+        self.configs = configs
+        self.index = TitleIndex(model)
+
+    def cmdloop(self, intro: str | None = None) -> None:
+        try:
+            super(Shell, self).cmdloop(intro)
+        except KeyboardInterrupt:  # Leave like `exit` does
+            print()
+            self.postloop()
+
+    def preloop(self) -> None:
+        if readline is not None:
+            readline.set_history_length(HISTORY_LENGTH)
+            if HISTORY_FILE.exists():
+                readline.read_history_file(HISTORY_FILE)
+
+    def postloop(self) -> None:
+        if readline is not None:
+            readline.write_history_file(HISTORY_FILE)
+
+    def emptyline(self) -> bool:
+        # Don't repeat the last command
+        return False
+
+    def onecmd(self, line: str) -> bool:
+        try:
+            words = shlex.split(line)
+        except ValueError as e:
+            self.logger.error(str(e))
+            self.logger.flush()
+            return False
+        if not words:
+            return self.emptyline()
+        command = words[0]
+        if command in EXIT_COMMANDS or command == 'EOF':
+            return True
+        if command == 'help':
+            print_help()
+            return False
+        if command == 'shell':
+            self.logger.warning("Already in the shell")
+            self.logger.flush()
+            return False
+        if is_local(words):  # Would take over the shell's stdin
+            reason = 'needs `-f <file>`' if command == 'batch' else "can't run"
+            self.logger.error(f"`{command}` {reason} in the shell")
+            self.logger.flush()
+            return False
+
+        command, params = parser(['shell', *words])
+        self.logger.context['command'] = command
+        try:
+            if not dispatch(command, params, self.model, self.logger, self.configs):
+                self.logger.error(f"Unknown command `{command}`, type `help` for the commands")
+        finally:
+            self.logger.flush()
+        return False
+
+    def completenames(self, text: str, *ignored: str) -> List[str]:
+        names = (*COMMANDS, 'help', *EXIT_COMMANDS)
+        return sorted(name for name in names
+                      if name.startswith(text) and name not in LOCAL_COMMANDS)
+
+    def completedefault(self, text: str, line: str, begidx: int, endidx: int) -> List[str]:
+        """Complete the title after `-t`, even if it has spaces (when quoted)
+        """
+        flag = line.rfind(' -t ', 0, begidx)
+        if flag == -1:
+            return []
+        typed = line[flag + len(' -t '):endidx]
+        quote = typed[:1] if typed[:1] in ('"', "'") else ''
+        prefix = typed[len(quote):]
+        if not quote and ' ' in prefix:  # Another parameter
+            return []
+        # The part of the title before the word being completed
+        skip = len(prefix) - len(text)
+        return [f"{title[skip:]}{quote}" for title in self.index.starting_with(prefix)]
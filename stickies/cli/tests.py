@@ -0,0 +1,246 @@
+import os
+import json
+import stat
+import shutil
+import socket
+import threading
+import unittest
+import tempfile
+from unittest import mock
+from pathlib import Path
+from models import Model
+from jsonwrapper import Handler
+from actions.migrations import MIGRATIONS
+from cli import daemon
+from cli.cli import cli
+from logger import (
+    Logger,
+    JsonSink,
+)
+
+
+NOTES_TABLE = {
+    'title': 'TEXT type UNIQUE',
+    'content': 'TEXT',
+    'priority': 'INTEGER',
+    'date_created': 'INTEGER',
+    'date_edited': 'INTEGER',
+    'done': 'INTEGER',
+}
+
+
+class CliTestCase(unittest.TestCase):
+    """Runs the commands against a db of their own, every log is kept as
+    the json event of a `JsonSink`
+    """
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.model = Model('test_cli', self.directory, **NOTES_TABLE)
+        self.model.create_table()
+        self.model.migrate(MIGRATIONS)
+        self.configs = Handler(f"{self.directory}/config.json",
+                               {'quiet': 1, 'sort_by': 'priority', 'search_by': 'title'})
+        self.configs.init()
+        self.log_file = f"{self.directory}/log.jsonl"
+        self.logger = Logger(1, sink=JsonSink(self.log_file))
+
+    def tearDown(self) -> None:
+        self.model.close()
+        shutil.rmtree(self.directory)
+
+    def run_cli(self, *args: str) -> list:
+        """Run a command
+
+        :return: The events it logged
+        :rtype: list
+        """
+        cli(['stickies.py', *args], self.model, self.logger, self.configs)
+        if not os.path.exists(self.log_file):
+            return []
+        with open(self.log_file) as f:
+            events = [json.loads(line) for line in f]
+        os.remove(self.log_file)
+        return events
+
+    def write(self, name: str, content: str) -> str:
+        path = f"{self.directory}/{name}"
+        with open(path, mode='w') as f:
+            f.write(content)
+        return path
+
+
+class TestImport(CliTestCase):
+    def imported(self, *args: str) -> dict:
+        return self.run_cli('import', *args)[-1]
+
+    def test_import(self):
+        file = self.write('notes.csv', 'title,content,priority,done\na,b,1,1\nc,d,2,\n')
+        event = self.imported('-f', file)
+        self.assertEqual((event['inserted'], event['invalid']), (2, 0))
+        # An empty `done` is not done
+        self.assertEqual(self.model.select('title', 'c')[0][5], 0)
+
+        event = self.imported('-f', file)
+        self.assertEqual((event['inserted'], event['duplicates']), (0, 2))
+
+    def test_invalid_records(self):
+        file = self.write('notes.csv', 'title,content,priority\na,b,1\nshort\nc,d,x\ne,f,3\n')
+        event = self.imported('-f', file, '-s', '1')
+        self.assertEqual((event['inserted'], event['invalid']), (2, 2))
+
+        file = self.write('notes.json', json.dumps([
+            {'title': 5, 'content': 'x', 'priority': 1},
+            {'title': 'g', 'content': 'x', 'priority': 1},
+        ]))
+        self.assertEqual((self.imported('-f', file)['inserted']), 1)
+
+        file = self.write('notes.ndjson', '{"title": "h", "content": "x", "priority": 1}\n'
+                                          '{"title": "i", "content"\n'
+                                          '{"title": "j", "content": "x", "priority": 1}\n')
+        event = self.imported('-f', file)
+        self.assertEqual((event['inserted'], event['invalid']), (2, 1))
+
+    def test_relative_file(self):
+        self.write('notes.ndjson', '{"title": "a", "content": "b", "priority": 1}\n')
+        # Relative to where the program was started, not to its own dir
+        with mock.patch('cli.cli.WORKING_DIR', self.directory):
+            event = self.imported('-f', 'notes.ndjson')
+        self.assertEqual(event['inserted'], 1)
+
+    def test_wrong_params(self):
+        file = self.write('notes.csv', 'title,content,priority\na,b,1\n')
+        for args in (('-f', file, '-s', '0'), ('-f', file, '-s', 'x'), ()):
+            self.assertEqual(self.imported(*args)['level'], 'error')
+        self.assertFalse(self.model.fetch_all())
+
+
+class TestSearch(CliTestCase):
+    def setUp(self) -> None:
+        super(TestSearch, self).setUp()
+        self.run_cli('add', '-t', 'groceries', '-c', 'buy milk', '-p', '1')
+        self.run_cli('add', '-t', 'milk', '-c', 'the milk', '-p', '2')
+
+    def test_search(self):
+        titles = [event['title'] for event in self.run_cli('search', '-q', 'milk')]
+        self.assertEqual(titles, ['milk', 'groceries'])
+        events = self.run_cli('search', '-q', 'milk', '-f', 'title')
+        self.assertEqual([event['title'] for event in events], ['milk'])
+
+    def test_wrong_fields(self):
+        # `priority` is a column, but it's not in the search index
+        for fields in ('priority', 'nope', 'title,priority'):
+            events = self.run_cli('search', '-q', '1', '-f', fields)
+            self.assertEqual([event['level'] for event in events], ['error'])
+
+
+class TestBatch(CliTestCase):
+    def test_batch(self):
+        file = self.write('commands.txt', '\n'.join((
+            '# Comments and blank lines are skipped',
+            'add -t a -c "first sticky" -p 1',
+            '',
+            'add -t b -c second -p 2',
+            'nope -t c',
+            'add -t "unclosed -c x -p 1',
+            'batch -f commands.txt',
+            '   # An indented comment',
+            'add -t c -c third -p 3',
+        )))
+        events = self.run_cli('batch', '-f', file, '-s', '2')
+        done = events[-1]
+        # 6 commands in chunks of 2
+        self.assertEqual((done['ran'], done['failed'], done['commits']), (3, 3, 3))
+        self.assertEqual(len(self.model.fetch_all()), 3)
+        self.assertEqual(self.model.select('title', 'a')[0][1], 'first sticky')
+
+        errors = {event['line']: event['message'] for event in events if event['level'] == 'error'}
+        self.assertEqual(sorted(errors), [5, 6, 7])
+        self.assertIn('Unknown command `nope`', errors[5])
+        self.assertIn("`batch` can't run inside a batch", errors[7])
+
+    def test_chunk_size(self):
+        file = self.write('commands.txt', ''.join(f"add -t t{i} -c c -p 1\n" for i in range(5)))
+        done = self.run_cli('batch', '-f', file)[-1]
+        self.assertEqual((done['ran'], done['commits']), (5, 1))
+        self.assertEqual(self.run_cli('batch', '-f', file, '-s', 'x')[-1]['level'], 'error')
+
+
+class TestDaemon(CliTestCase):
+    def setUp(self) -> None:
+        super(TestDaemon, self).setUp()
+        self.path = Path(f"{self.directory}/test.sock")
+        # Logs as text, they are the output sent to the clients
+        self.server = daemon.Server(self.path, self.model, Logger(1, buffered=True), self.configs)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        super(TestDaemon, self).tearDown()
+
+    def test_request(self):
+        self.assertTrue(daemon.is_running(self.path))
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+        status, output = daemon.request(['add', '-t', 'a', '-c', 'milk', '-p', '1'], self.path)
+        self.assertEqual(status, 0)
+        self.assertIn('`a` was added', output)
+        self.assertEqual(len(self.model.fetch_all()), 1)
+        # `-f` of search are fields, not a file
+        status, output = daemon.request(['search', '-q', 'milk', '-f', 'content'], self.path)
+        self.assertIn("title = 'a'", output)
+
+    def test_local_commands(self):
+        status, output = daemon.request(['serve'], self.path)
+        self.assertEqual(status, 1)
+        self.assertIn("can't run in the daemon", output)
+
+    def test_relative_file(self):
+        self.write('notes.ndjson', '{"title": "a", "content": "b", "priority": 1}\n')
+        self.write('commands.txt', 'add -t b -c c -p 2\n')
+        # The daemon runs from elsewhere, the files are in the dir of the client
+        with mock.patch('cli.daemon.WORKING_DIR', self.directory):
+            status, output = daemon.request(['import', '-f', 'notes.ndjson'], self.path)
+            self.assertIn('1 stickies were imported', output)
+            status, output = daemon.request(['batch', '-f', 'commands.txt'], self.path)
+            self.assertIn('1 commands were run', output)
+        self.assertEqual(len(self.model.fetch_all()), 2)
+
+    def test_no_daemon(self):
+        path = Path(f"{self.directory}/none.sock")
+        self.assertFalse(daemon.is_running(path))
+        self.assertIsNone(daemon.request(['get_total'], path))
+
+    def test_dropped_connection(self):
+        path = f"{self.directory}/drop.sock"
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        server.listen()
+
+        def drop():
+            connection, _ = server.accept()
+            connection.recv(4096)
+            connection.close()
+
+        thread = threading.Thread(target=drop)
+        thread.start()
+        try:
+            # It may have run, so it's not run again
+            status, output = daemon.request(['add', '-t', 'a', '-c', 'b', '-p', '1'], Path(path))
+        finally:
+            thread.join()
+            server.close()
+        self.assertEqual(status, 1)
+        self.assertIn('may not have run', output)
+
+    def test_args(self):
+        self.assertTrue(daemon.is_local(['shell']))
+        self.assertTrue(daemon.is_local(['batch']))
+        self.assertTrue(daemon.is_local(['batch', '-f', '-']))
+        self.assertFalse(daemon.is_local(['batch', '-f', 'commands.txt']))
+        self.assertFalse(daemon.is_local(['add', '-t', 'a']))
+        self.assertEqual(daemon._resolve(['import', '-f', 'a.csv'], '/x'), ['import', '-f', '/x/a.csv'])
+        self.assertEqual(daemon._resolve(['import', '-f', '/y/a.csv'], '/x'), ['import', '-f', '/y/a.csv'])
+        self.assertEqual(daemon._resolve(['search', '-q', 'a', '-f', 'title'], '/x'),
+                         ['search', '-q', 'a', '-f', 'title'])
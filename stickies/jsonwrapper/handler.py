@@ -1,12 +1,37 @@
+from __future__ import annotations
 import os
+import copy
 import json
-from typing import Any
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import (
+    Iterator,
+    Tuple,
+    Any,
+)
+try:
+    import fcntl
+except ImportError:  # Not on posix, the lock is only taken within the process
+    fcntl = None
 
 
 class Handler:
+    """A json file on disk. The parsed file is kept in memory and it's only
+    read again when its mtime or size changes (or after `invalidate`).
+    Writes replace the file atomically while holding an advisory lock
+    (`{file}.lock`), so other processes see either the old or the new file
+    """
     def __init__(self, file: str, config: Any) -> None:
         self._file = file
         self.config = config
+        self._cache: Any = None
+        self._stamp: Tuple[int, int] | None = None
+        self._mutex = threading.RLock()
+        self._lock_file: Any = None
+        self._lock_depth = 0
+        self._batch_depth = 0
+        self._pending = False
 
     def __str__(self) -> str:
         return self._read()
@@ -18,49 +43,147 @@ class Handler:
     def file(self):
         return self._file
 
+    def _stat(self) -> Tuple[int, int] | None:
+        try:
+            stat = os.stat(self.file)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold the lock of the file, reentrant
+        """
+        with self._mutex:
+            if self._lock_depth == 0:
+                self._lock_file = open(f"{self.file}.lock", mode='a')
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    # Closing the file releases the lock
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def _dump(self, data: Any):
+        """Write to a temporary file next to `file` and move it in place
+        """
+        directory, name = os.path.split(os.path.abspath(self.file))
+        fd, temp = tempfile.mkstemp(prefix=f".{name}.", suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, mode='w') as f:
+                json.dump(data, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp, self.file)
+        except BaseException:
+            os.remove(temp)
+            raise
+
     def _write(self, data: Any):
-        with open(self.file, mode='w') as f:
-            json.dump(data, f, indent=4)
+        with self._locked():
+            self._cache = copy.deepcopy(data)
+            if self._batch_depth:
+                self._pending = True
+                return
+            self._dump(data)
+            self._stamp = self._stat()
 
     def _read(self):
-        with open(self.file, mode='r') as f:
-            return json.load(f)
+        """The cached data, it must not be mutated (see `read`)
+        """
+        if self._pending:  # Not written yet, see `batch`
+            return self._cache
+        stamp = self._stat()
+        if self._stamp is None or stamp != self._stamp:
+            with open(self.file, mode='r') as f:
+                self._cache = json.load(f)
+            self._stamp = stamp
+        return self._cache
+
+    @contextmanager
+    def batch(self) -> Iterator['Handler']:
+        """Hold the lock and write the file once, when the (outermost) block
+        ends. If the block raises nothing is written
+        """
+        with self._locked():
+            self._batch_depth += 1
+            try:
+                yield self
+            except BaseException:
+                if self._batch_depth == 1:
+                    self._pending = False
+                    self.invalidate()
+                raise
+            else:
+                if self._batch_depth == 1 and self._pending:
+                    self._pending = False
+                    self._dump(self._cache)
+                    self._stamp = self._stat()
+            finally:
+                self._batch_depth -= 1
+
+    def invalidate(self):
+        """Read the file again on the next access
+        """
+        self._cache = None
+        self._stamp = None
 
     def init(self):
-        if not os.path.exists(self.file):
-            self._write(self.config)
+        """Create the file with the default `config`. If it exists, add the
+        keys of `config` it's missing (eg. settings added in a newer version)
+        """
+        with self._locked():
+            if not os.path.exists(self.file):
+                self._write(self.config)
+            elif isinstance(self.config, dict):
+                data = self.read()
+                missing = {key: value for (key, value) in self.config.items() if key not in data}
+                if missing:
+                    self._write({**data, **missing})
 
     def write(self, data: Any):
         self._write(data)
 
     def read(self) -> Any:
-        return self._read()
+        return copy.deepcopy(self._read())
 
     def get(self, key: Any):
         data = self._read()
         return data[key]
 
     def remove_key(self, key: Any):
-        data = self._read()
-        del data[key]
-        self._write(data)
+        with self._locked():
+            data = self.read()
+            del data[key]
+            self._write(data)
 
     def edit(self, key: Any, value: Any, value_type: type):
-        data = self._read()
-        if key not in data:
-            msg = f"Key `{key}` does not exist. If you want to add a key use `Handler.add`"
-            raise ValueError(msg)
-        data[key] = value_type(value)
-        self._write(data)
+        with self._locked():
+            data = self.read()
+            if key not in data:
+                msg = f"Key `{key}` does not exist. If you want to add a key use `Handler.add`"
+                raise ValueError(msg)
+            data[key] = value_type(value)
+            self._write(data)
 
     def add(self, key: Any, value: Any, value_type: type):
-        data = self.read()
-        data[key] = value_type(value)
-        self._write(data)
+        with self._locked():
+            data = self.read()
+            data[key] = value_type(value)
+            self._write(data)
 
     def restore_default(self):
-        self.delete_all()
-        self.init()
+        with self._locked():
+            self.delete_all()
+            self.init()
 
     def delete_all(self):
-        os.remove(self.file)
+        with self._locked():
+            os.remove(self.file)
+            self._pending = False
+            self.invalidate()
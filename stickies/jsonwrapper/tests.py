@@ -1,4 +1,7 @@
+import os
+import json
 import unittest
+from unittest.mock import patch
 from . import Handler
 from pathlib import Path
 from actions.constants import BASE_DIR
@@ -13,6 +16,7 @@ class TestHandler(unittest.TestCase):
 
     def tearDown(self) -> None:
         self.file.restore_default()
+        os.remove(f"{self.file.file}.lock")
 
     def test_read(self):
         data = self.file.read()
@@ -42,3 +46,65 @@ class TestHandler(unittest.TestCase):
         self.file.restore_default()
         default = self.file.read()
         self.assertEqual(self.data, default)
+
+    def test_cached(self):
+        self.file.get('c0')
+        with patch('json.load') as load:
+            self.assertEqual(self.file.get('c1'), self.data['c1'])
+            load.assert_not_called()
+
+    def test_read_copy(self):
+        data = self.file.read()
+        data['c0'] = 'other'
+        self.assertEqual(self.file.get('c0'), self.data['c0'])
+
+    def test_external_change(self):
+        self.file.get('c0')
+        with open(self.file.file, mode='w') as f:
+            json.dump({'c0': 'changed by another process'}, f)
+        self.assertEqual(self.file.get('c0'), 'changed by another process')
+
+    def test_invalidate(self):
+        self.file.get('c0')
+        stamp = os.stat(self.file.file)
+        with open(self.file.file, mode='w') as f:
+            json.dump({'c0': 'o0', 'c1': 'o1'}, f, indent=4)
+        # Same mtime and size, only `invalidate` notices
+        os.utime(self.file.file, ns=(stamp.st_atime_ns, stamp.st_mtime_ns))
+        self.assertEqual(self.file.get('c0'), self.data['c0'])
+        self.file.invalidate()
+        self.assertEqual(self.file.get('c0'), 'o0')
+
+    def test_batch(self):
+        with patch.object(self.file, '_dump', wraps=self.file._dump) as dump:
+            with self.file.batch():
+                self.file.edit('c0', 'o0', str)
+                self.file.add('c2', 'v2', str)
+                self.file.remove_key('c1')
+                self.assertEqual(self.file.get('c0'), 'o0')
+                dump.assert_not_called()
+            dump.assert_called_once()
+        with open(self.file.file) as f:
+            self.assertEqual(json.load(f), {'c0': 'o0', 'c2': 'v2'})
+
+    def test_batch_error(self):
+        with self.assertRaises(KeyError):
+            with self.file.batch():
+                self.file.edit('c0', 'o0', str)
+                self.file.remove_key('missing')
+        self.assertEqual(self.file.read(), self.data)
+
+    def test_atomic_write(self):
+        with patch('json.dump', side_effect=OSError):
+            with self.assertRaises(OSError):
+                self.file.edit('c0', 'o0', str)
+        self.file.invalidate()
+        self.assertEqual(self.file.read(), self.data)
+        directory = os.path.dirname(os.path.abspath(self.file.file))
+        self.assertFalse([i for i in os.listdir(directory) if i.endswith('.tmp')])
+
+    def test_init_missing_keys(self):
+        self.file.write({'c0': 'o0'})
+        Handler(self.file.file, dict(self.data, c2='v2')).init()
+        self.file.invalidate()
+        self.assertEqual(self.file.read(), {'c0': 'o0', 'c1': 'v1', 'c2': 'v2'})
@@ -5,8 +5,12 @@ TODO: Change this to a module docstring
 """
 from __future__ import annotations
 import sys
+import json
+import time
+import atexit
 from enum import Enum
 from typing import (
+    Callable,
     Tuple,
     Dict,
     List,
@@ -18,6 +22,7 @@ __name__ = 'testing'
 __all__ = [
     'UnhandledLogError',
     'get_color',
+    'JsonSink',
     'Logger',
 ]
 
@@ -45,8 +50,25 @@ class Color(Enum):
     WHITE_BOLD = "\033[1;37m"    # WHITE
 
 
+COLORS = {i.name: i.value for i in Color}
+RESET = Color.RESET.value
+# The color of every log function (but `custom`)
+LOG_COLORS = {
+    'info': Color.YELLOW.value,
+    'success': Color.GREEN.value,
+    'warning': Color.RED.value,
+    'error': Color.RED_BOLD.value,
+    'debug': Color.BLUE.value,
+}
+# Lines kept by a buffered `Logger` before they are written
+BUFFER_LINES = 1024
+# When a `JsonSink` writes its events, whichever comes first
+BATCH_EVENTS = 256
+FLUSH_INTERVAL = 1.0
+
+
 def get_color(color: str) -> str:
-    return {i.name: i.value for i in Color}[color.upper()]
+    return COLORS[color.upper()]
 
 
 class Config:
@@ -63,6 +85,8 @@ class Config:
             'error': 1,
             'debug': 2,
         }
+        # Called after every change of the level or the settings
+        self._listeners: List[Callable[[], None]] = []
         self.level = level
         self._iter = 0
 
@@ -119,6 +143,16 @@ class Config:
         if not 0 < v <= 5:
             raise ValueError(f"Level must be between `0-5` not `{v}`")
         self._level = v
+        self._changed()
+
+    def _changed(self) -> None:
+        for listener in self._listeners:
+            listener()
+
+    def subscribe(self, listener: Callable[[], None]) -> None:
+        """Call `listener` whenever the level or the settings change
+        """
+        self._listeners.append(listener)
 
     def items(self):  # type: ignore
         yield self._settings.items()
@@ -138,6 +172,7 @@ class Config:
         if all(key in self.settings for key in settings) and\
            all(0 < settings[key] <= 5 for key in settings):
             self._settings.update(settings)
+            self._changed()
         else:
             raise ValueError(f"Invalid key or value in {settings}. Remember,\
  key has to exists in {self.settings} and all values have to be between (1-5)")
@@ -169,7 +204,7 @@ class MetaLogger(type):
 
         log_functions = 0
         target_log_functions = len(Config(1))
-        dismiss_attrs = ('settings',)
+        dismiss_attrs = ('settings', 'enabled', 'flush')
         for log in attrs:
             if not log.startswith('_') and log not in dismiss_attrs:
                 log_functions += 1
@@ -178,20 +213,84 @@ class MetaLogger(type):
         return type(name, bases, attrs)
 
 
+class JsonSink:
+    """Writes every log as a json object on its own line (json-lines), eg.
+    `{"level": "success", "timestamp": 1690000000.0, "command": "add",
+    "message": "...", "title": "..."}`, to a file (appended) or stdout.
+    The events are written in batches: when `batch_size` of them are waiting,
+    at the first event `interval` seconds after the last write, on `flush`
+    and when the interpreter exits
+    """
+    def __init__(self, file: str | None = None, batch_size: int = BATCH_EVENTS,
+                 interval: float = FLUSH_INTERVAL) -> None:
+        self.file = file
+        self.batch_size = batch_size
+        self.interval = interval
+        self._lines: List[str] = []
+        self._last_write = time.monotonic()
+        atexit.register(self.flush)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}(file={self.file})>"
+
+    def emit(self, level: str, msg: str, context: Dict[str, Any], fields: Dict[str, Any]) -> None:
+        event = {'level': level, 'timestamp': time.time(), **context, 'message': msg, **fields}
+        self._lines.append(json.dumps(event, default=str))
+        if len(self._lines) >= self.batch_size or\
+           time.monotonic() - self._last_write >= self.interval:
+            self.flush()
+
+    def flush(self) -> None:
+        self._last_write = time.monotonic()
+        if not self._lines:
+            return
+        data = '\n'.join(self._lines) + '\n'
+        self._lines.clear()
+        if self.file is None:
+            sys.stdout.write(data)
+            sys.stdout.flush()
+        else:
+            with open(self.file, mode='a') as f:
+                f.write(data)
+
+
 class Logger(int, metaclass=MetaLogger):
     """The Logger class handles debbuging with colored information
     based on the level. Each instance has its own settings which the
     user can change independently through `self.settings.update()`.
-    Mind that level 1 will print evetything and level 5 less
+    Mind that level 1 will print evetything and level 5 less.
+    Wheather each log prints (and its prefix) is worked out only when the
+    settings change, so a log that doesn't print costs a lookup.
+    Every log function also takes keyword `fields` (eg. `title=...`),
+    which only a `JsonSink` records, along with `self.context`
     """
-    def __init__(self, level: int = 2):
+    def __new__(cls, *args: int, buffered: bool = False, sink: JsonSink | None = None) -> Logger:
+        return super(Logger, cls).__new__(cls, *args)
+
+    def __init__(self, level: int = 2, *, buffered: bool = False, sink: JsonSink | None = None):
         """Initializer of Logger object
 
         :param level: The level of debugging. Based on that, some informations\
             can be configured to not show up thus lowering the verbosity, defaults to 2
         :type level: int, optional
+        :param buffered: Keep the logs in memory and write them in batches, they\
+            must be written with `flush` when done, defaults to False
+        :type buffered: bool, optional
+        :param sink: Log json objects to it instead of colored text, defaults to None
+        :type sink: JsonSink | None, optional
         """
+        self._sink = sink
+        # Added to every event of the sink, eg. the command being run
+        self.context: Dict[str, Any] = {}
+        self._buffered = buffered
+        self._buffer: List[str] = []
+        self._enabled: Dict[str, bool] = {}
+        self._prefixes = {
+            name: f"{color}[{name.upper()}]: " for (name, color) in LOG_COLORS.items()
+        }
         self._settings = Config(level)
+        self._settings.subscribe(self._update)
+        self._update()
 
     def __str__(self) -> str:
         return f"<{self.__class__.__name__}Object-{self._settings._INSTANCE}>"
@@ -208,43 +307,74 @@ class Logger(int, metaclass=MetaLogger):
         """
         return self._settings
 
-    def _runner(self, func_name: str) -> bool:
-        """Use to check the `self.level` before printing the log
+    def _update(self) -> None:
+        """Work out which log functions print, after the settings changed
+        """
+        level = self._settings.level
+        self._enabled = {name: level <= value for (name, value) in self._settings.settings.items()}
+
+    def _write(self, line: str) -> None:
+        if self._buffered:
+            self._buffer.append(line)
+            if len(self._buffer) >= BUFFER_LINES:
+                self.flush()
+        else:
+            # Looked up on every write, `sys.stdout` may be replaced
+            sys.stdout.write(line)
+
+    def _log(self, name: str, msg: str, fields: Dict[str, Any]) -> None:
+        if self._sink is not None:
+            self._sink.emit(name, msg, self.context, fields)
+        else:
+            self._write(f"{self._prefixes[name]}{msg}{RESET}\n")
+
+    def flush(self) -> None:
+        """Write the buffered logs
+        """
+        if self._sink is not None:
+            self._sink.flush()
+            return
+        if self._buffer:
+            sys.stdout.write(''.join(self._buffer))
+            self._buffer.clear()
+        sys.stdout.flush()
+
+    def enabled(self, func_name: str) -> bool:
+        """Wheather a log function prints with the current settings, to skip
+        building expensive messages
 
         :param func_name: Name of the function as a string
         :type func_name: str
         :return: Wheather the settings allow this certain function to print
         :rtype: bool
         """
-        return self.settings.level <= self.settings[func_name]
+        return self._enabled[func_name]
 
     # ONLY LOGGING FUNCTIONS AFTER THIS
     def custom(self, msg: str, header: str = 'custom',
-               color: str = get_color('reset')) -> None:
-        if self._runner('custom'):
-            print(f"{color}[{header.upper()}]: {msg}{get_color('reset')}")
-
-    def info(self, msg: str) -> None:
-        func_name = sys._getframe().f_code.co_name
-        if self._runner(func_name):
-            print(f"{Color.YELLOW.value}[{func_name.upper()}]: {msg}{get_color('reset')}")
-
-    def success(self, msg: str) -> None:
-        func_name = sys._getframe().f_code.co_name
-        if self._runner(func_name):
-            print(f"{Color.GREEN.value}[{func_name.upper()}]: {msg}{get_color('reset')}")
-
-    def warning(self, msg: str) -> None:
-        func_name = sys._getframe().f_code.co_name
-        if self._runner(func_name):
-            print(f"{Color.RED.value}[{func_name.upper()}]: {msg}{get_color('reset')}")
-
-    def error(self, msg: str) -> None:
-        func_name = sys._getframe().f_code.co_name
-        if self._runner(func_name):
-            print(f"{Color.RED_BOLD.value}[{func_name.upper()}]: {msg}{get_color('reset')}")
-
-    def debug(self, msg: str) -> None:
-        func_name = sys._getframe().f_code.co_name
-        if self._runner(func_name):
-            print(f"{Color.BLUE.value}[{func_name.upper()}]: {msg}{get_color('reset')}")
+               color: str = RESET, **fields: Any) -> None:
+        if self._enabled['custom']:
+            if self._sink is not None:
+                self._sink.emit('custom', msg, self.context, {'header': header, **fields})
+            else:
+                self._write(f"{color}[{header.upper()}]: {msg}{RESET}\n")
+
+    def info(self, msg: str, **fields: Any) -> None:
+        if self._enabled['info']:
+            self._log('info', msg, fields)
+
+    def success(self, msg: str, **fields: Any) -> None:
+        if self._enabled['success']:
+            self._log('success', msg, fields)
+
+    def warning(self, msg: str, **fields: Any) -> None:
+        if self._enabled['warning']:
+            self._log('warning', msg, fields)
+
+    def error(self, msg: str, **fields: Any) -> None:
+        if self._enabled['error']:
+            self._log('error', msg, fields)
+
+    def debug(self, msg: str, **fields: Any) -> None:
+        if self._enabled['debug']:
+            self._log('debug', msg, fields)
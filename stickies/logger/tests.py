@@ -1,7 +1,10 @@
 import io
+import os
+import json
+import tempfile
 import unittest
 import unittest.mock
-from .logger import Logger, Config
+from .logger import Logger, Config, JsonSink
 
 
 class TestLogger(unittest.TestCase):
@@ -99,4 +102,64 @@ class TestLogger(unittest.TestCase):
 
         self.assertEqual(total0, total0, msg="There is something wrong with Config.__iter__ and Config.__next__. Maybe the index (self._iter) is not refreshing correctly")  # noqa
 
+    @unittest.mock.patch('sys.stdout', new_callable=io.StringIO)
+    def test_settings_change(self, mock_stdout):
+        self.logger.settings.update(info=1)
+        self.logger.settings.level = 2
+        self.assertFalse(self.logger.enabled('info'))
+        self.logger.info("anything")
+        self.assertFalse(mock_stdout.getvalue())
+
+        self.logger.settings.update(info=3)
+        self.assertTrue(self.logger.enabled('info'))
+        self.logger.info("anything")
+        self.assertIn("[INFO]: anything", mock_stdout.getvalue())
+
+    @unittest.mock.patch('sys.stdout', new_callable=io.StringIO)
+    def test_buffered(self, mock_stdout):
+        logger = Logger(1, buffered=True)
+        logger.success("first")
+        logger.custom("second", 'header')
+        self.assertFalse(mock_stdout.getvalue())
+
+        logger.flush()
+        lines = mock_stdout.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn("[SUCCESS]: first", lines[0])
+        self.assertIn("[HEADER]: second", lines[1])
+
+    def test_json_sink(self):
+        file = os.path.join(tempfile.mkdtemp(), 'log.jsonl')
+        sink = JsonSink(file, batch_size=3, interval=60)
+        logger = Logger(1, sink=sink)
+        logger.context['command'] = 'add'
+        logger.success("added", title='a')
+        logger.custom("sticky", 'header', id=1)
+        self.assertFalse(os.path.exists(file), msg="Events are not batched")
+
+        logger.info("third")
+        with open(file) as f:
+            events = [json.loads(line) for line in f]
+        self.assertEqual(len(events), 3)
+        self.assertEqual(events[0]['level'], 'success')
+        self.assertEqual(events[0]['command'], 'add')
+        self.assertEqual(events[0]['message'], 'added')
+        self.assertEqual(events[0]['title'], 'a')
+        self.assertEqual(events[1]['header'], 'header')
+        self.assertEqual(events[1]['id'], 1)
+        self.assertIsInstance(events[2]['timestamp'], float)
+
+        logger.settings.level = 5
+        logger.info("hidden")
+        logger.flush()
+        with open(file) as f:
+            self.assertEqual(len(f.readlines()), 3)
+        os.remove(file)
+
+    @unittest.mock.patch('sys.stdout', new_callable=io.StringIO)
+    def test_json_sink_interval(self, mock_stdout):
+        logger = Logger(1, sink=JsonSink(interval=0))
+        logger.error("now")
+        self.assertEqual(json.loads(mock_stdout.getvalue())['message'], 'now')
+
 # TODO: Test the effect of the metaclass
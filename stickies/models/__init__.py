@@ -1 +1,9 @@
 from .model import * # noqa
+
+
+def __getattr__(name):
+    # asyncio is slow to import, only the users of `AsyncModel` pay for it
+    if name == 'AsyncModel':
+        from .aio import AsyncModel
+        return AsyncModel
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
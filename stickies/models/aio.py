@@ -0,0 +1,229 @@
+from __future__ import annotations
+import queue
+import asyncio
+import threading
+from functools import lru_cache
+from .model import (
+    STATEMENT_CACHE_SIZE,
+    Model,
+    Params,
+)
+from typing import (
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Sequence,
+    Mapping,
+    Tuple,
+    List,
+    Any,
+)
+
+
+__all__ = ['AsyncModel']
+
+# Requests that may wait for the db thread before `submit` blocks the caller
+MAX_PENDING = 1024
+# Most requests that are run in one transaction
+MAX_BATCH = 256
+# Rows read at a time by `AsyncModel.iterate`
+PAGE_SIZE = 500
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _keyset_query(table: str, order_by: str, direction: str, first: bool) -> str:
+    # `(column, id)` is unique, so each page starts right after the last row of the previous one
+    compare = '<' if direction == 'DESC' else '>'
+    where = '' if first else f"WHERE ({order_by}, id) {compare} (?, ?) "
+    return f"SELECT * FROM {table} {where}ORDER BY {order_by} {direction}, id {direction} LIMIT ?"
+
+
+class _Request:
+    def __init__(self, job: Callable[..., Any], args: Tuple[Any, ...], write: bool,
+                 future: asyncio.Future, loop: asyncio.AbstractEventLoop) -> None:
+        self.job = job
+        self.args = args
+        self.write = write
+        self.future = future
+        self.loop = loop
+
+    def resolve(self, result: Any = None, error: BaseException | None = None) -> None:
+        """Hand the outcome to the coroutine that waits for it, from the db thread
+        """
+        def set() -> None:
+            if self.future.cancelled():
+                return
+            if error is not None:
+                self.future.set_exception(error)
+            else:
+                self.future.set_result(result)
+
+        self.loop.call_soon_threadsafe(set)
+
+
+class AsyncModel:
+    """Awaitable access to a `Model`. Every request runs on one dedicated db
+    thread (with its own connection), in the order it was made. The requests
+    that pile up while the thread is busy run together in one transaction,
+    each in its own savepoint, so a request that fails doesn't affect the
+    others. At most `max_pending` requests wait at a time, the rest of the
+    callers wait for a free slot
+    ```
+        async with AsyncModel(Model('my_db', user='TEXT')) as model:
+            await asyncio.gather(*(model.insert(user=f"user {i}") for i in range(100)))
+            async for row in model.iterate('user'):
+                ...
+    ```
+    """
+    def __init__(self, model: Model, max_pending: int = MAX_PENDING,
+                 max_batch: int = MAX_BATCH) -> None:
+        self.model = model
+        self.max_batch = max_batch
+        self._slots = asyncio.Semaphore(max_pending)
+        self._requests: queue.SimpleQueue[_Request | None] = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}({self.model.name})>"
+
+    async def __aenter__(self) -> AsyncModel:
+        self.start()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"{self.model.name}-db",
+                                            daemon=True)
+            self._thread.start()
+
+    async def close(self) -> None:
+        """Run the requests already made, then stop the db thread (closing
+        its connection). The other connections of the model are left open
+        """
+        if self._thread is None:
+            return
+        self._requests.put(None)
+        await asyncio.get_running_loop().run_in_executor(None, self._thread.join)
+        self._thread = None
+
+    def _run(self) -> None:
+        try:
+            stop = False
+            while not stop:
+                request = self._requests.get()
+                if request is None:
+                    break
+                batch = [request]
+                while len(batch) < self.max_batch:
+                    try:
+                        request = self._requests.get_nowait()
+                    except queue.Empty:
+                        break
+                    if request is None:
+                        stop = True
+                        break
+                    batch.append(request)
+                self._execute(batch)
+        finally:
+            self.model.close(current_thread=True)
+
+    def _execute(self, batch: List[_Request]) -> None:
+        if not any(request.write for request in batch):
+            for request in batch:
+                try:
+                    request.resolve(request.job(*request.args))
+                except Exception as e:
+                    request.resolve(error=e)
+            return
+
+        # Writes are only reported once they are commited
+        outcomes: List[Tuple[Any, BaseException | None]] = []
+        try:
+            with self.model.transaction():
+                for request in batch:
+                    try:
+                        with self.model.transaction():  # A savepoint
+                            outcomes.append((request.job(*request.args), None))
+                    except Exception as e:
+                        outcomes.append((None, e))
+        except Exception as e:  # The commit failed
+            for request in batch:
+                request.resolve(error=e)
+            return
+        for (request, (result, error)) in zip(batch, outcomes):
+            request.resolve(result, error)
+
+    async def submit(self, job: Callable[..., Any], *args: Any, write: bool = True) -> Any:
+        """Run `job(*args)` on the db thread and return its result
+
+        :param job: Uses the model (or its connection), it must not block on the event loop
+        :type job: Callable[..., Any]
+        :param write: Wheather `job` changes the db, defaults to True
+        :type write: bool, optional
+        :raises RuntimeError: If the model is not started
+        """
+        if self._thread is None:
+            raise RuntimeError(f"{self!r} is not started")
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._requests.put(_Request(job, args, write, future, loop))
+            return await future
+
+    async def execute(self, query: str, fetch: bool = False, params: Params = ()) -> Any:
+        return await self.submit(self.model.execute, query, fetch, params)
+
+    async def insert(self, **values: Any) -> int:
+        return await self.submit(lambda: self.model.insert(**values))
+
+    async def insert_many(self, rows: Iterable[Mapping[str, Any]], ignore: bool = False) -> int:
+        return await self.submit(self.model.insert_many, rows, ignore)
+
+    async def edit(self, field: str, value: Any, **values: Any) -> None:
+        return await self.submit(lambda: self.model.edit(field, value, **values))
+
+    async def delete(self, field: str, value: Any) -> None:
+        return await self.submit(self.model.delete, field, value)
+
+    async def select(self, field: str, value: Any) -> Any:
+        return await self.submit(self.model.select, field, value, write=False)
+
+    async def fetch_all(self) -> Any:
+        return await self.submit(self.model.fetch_all, write=False)
+
+    async def fetch_page(self, order_by: str = 'id', reverse: bool = False,
+                         limit: int | None = None, offset: int = 0) -> Any:
+        return await self.submit(self.model.fetch_page, order_by, reverse, limit, offset,
+                                 write=False)
+
+    async def search(self, query: str, fields: Sequence[str] | None = None,
+                     limit: int | None = None) -> Any:
+        return await self.submit(self.model.search, query, fields, limit, write=False)
+
+    async def count(self, where: Mapping[str, Any] | None = None) -> int:
+        return await self.submit(self.model.count, where, write=False)
+
+    async def iterate(self, order_by: str = 'id', reverse: bool = False,
+                      page_size: int = PAGE_SIZE) -> AsyncIterator[Any]:
+        """Every row sorted by a column, read a page at a time (only when the
+        previous one is consumed). Pages continue after the last row read
+        rather than skipping rows, so late pages are as fast as the first.
+        `order_by` should not contain NULLs, they can't be compared with
+
+        :raises ValueError: If `order_by` is not a column of the table
+        """
+        key = (self.model.column_index(order_by), self.model.column_index('id'))
+        direction = 'DESC' if reverse else 'ASC'
+        last = None
+        while True:
+            query = _keyset_query(self.model.name, order_by, direction, last is None)
+            params = (page_size,) if last is None else (*last, page_size)
+            page = await self.submit(self.model.execute, query, True, params, write=False)
+            for row in page:
+                yield row
+            if len(page) < page_size:
+                return
+            last = (page[-1][key[0]], page[-1][key[1]])
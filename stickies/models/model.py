@@ -1,7 +1,21 @@
 from __future__ import annotations
+import threading
+import itertools
 import sqlite3 as sqlite
 from pathlib import Path
-from typing import Any
+from functools import lru_cache
+from contextlib import contextmanager
+from typing import (
+    Generator,
+    Callable,
+    Sequence,
+    Iterable,
+    Mapping,
+    Tuple,
+    Union,
+    Dict,
+    Any,
+)
 from sqlite3 import (
     Connection,
 )
@@ -9,18 +23,67 @@ from sqlite3 import (
 
 __all__ = ['Model']
 
+# How many distinct SQL texts are kept, both as built strings and as
+# statements compiled by sqlite, per connection
+STATEMENT_CACHE_SIZE = 128
+Params = Union[Sequence[Any], Mapping[str, Any]]
+# A schema change, it gets the model and runs its statements through it
+Migration = Callable[['Model'], None]
 
-class ConnectionManager:
-    def __init__(self, db: str) -> None:
-        self.db = db
-        self._connection = sqlite.connect(self.db)
 
-    def __enter__(self) -> Connection:
-        return self._connection
+def _rollback(connection: Connection, *statements: str) -> None:
+    # After some errors sqlite has already rolled back the whole transaction
+    if connection.in_transaction:
+        for statement in statements:
+            connection.execute(statement)
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _insert_query(table: str, cols: Tuple[str, ...], verb: str = 'INSERT') -> str:
+    return f"{verb} INTO {table} ({','.join(cols)}) VALUES ({','.join('?' * len(cols))})"
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _update_query(table: str, cols: Tuple[str, ...], field: str) -> str:
+    return f"UPDATE {table} SET {','.join(f'{col}=?' for col in cols)} WHERE {field}=?"
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _select_query(table: str, field: str) -> str:
+    return f"SELECT * FROM {table} WHERE {field}=?"
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _page_query(table: str, order_by: str, direction: str) -> str:
+    # `id` breaks the ties so that pages never overlap
+    return f"SELECT * FROM {table} ORDER BY {order_by} {direction}, id {direction} LIMIT ? OFFSET ?"
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _count_query(table: str, cols: Tuple[str, ...]) -> str:
+    where = f" WHERE {' AND '.join(f'{col}=?' for col in cols)}" if cols else ''
+    return f"SELECT COUNT(*) FROM {table}{where}"
 
-    def __exit__(self, *args: Any) -> None:
-        self._connection.commit()
-        self._connection.close()
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _search_query(table: str) -> str:
+    return f"""SELECT {table}.* FROM {table}_fts JOIN {table} ON {table}.id = {table}_fts.rowid
+    WHERE {table}_fts MATCH ? ORDER BY {table}_fts.rank LIMIT ?"""
+
+
+def _match_expression(query: str, fields: Sequence[str] | None = None) -> str:
+    """Turn free text into an FTS5 query where every word is matched as a prefix
+    (`"stick"*`) so that the words of the text cannot be parsed as FTS5 syntax
+    """
+    words = ' '.join('"{}"*'.format(word.replace('"', '""')) for word in query.split())
+    if words and fields:
+        return f"{{{' '.join(fields)}}}: ({words})"
+    return words
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _delete_query(table: str, field: str) -> str:
+    return f"DELETE FROM {table} WHERE {field}=?"
 
 
 class Model:
@@ -40,6 +103,8 @@ class Model:
         self.db = str(Path(f"{save_path}/.{name}.sqlite"))
         self.table = table
         self.table['id'] = 'INTEGER PRIMARY KEY'
+        # The position of every column in a row, see `filter_row`
+        self._columns = {col: num for (num, col) in enumerate(self.table)}
 
         # Format the `table` into a string, is it should be in the query
         # Example: table = {name='TEXT' age='INTEGER'} would translate to:
@@ -48,22 +113,123 @@ class Model:
             f"{n} {t}," for (n, t) in table.items()
         )[:-1]
 
-    def execute(self, query: str, fetch: bool = False) -> Any:
+        # One long-lived connection per thread, keyed by the thread's ident.
+        # They are opened lazily by `self.connection` or explicitly by `open()`
+        self._connections: Dict[int, Connection] = {}
+        self._lock = threading.Lock()
+        # The columns of the search index, read once it is first needed
+        self._search_fields: Tuple[str, ...] | None = None
+
+    def __enter__(self) -> Model:
+        self.open()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    @property
+    def connection(self) -> Connection:
+        """The connection that belongs to the calling thread. It is
+        opened on first use and reused until `close()` is called
+
+        :return: An open sqlite connection
+        :rtype: Connection
+        """
+        connection = self._connections.get(threading.get_ident())
+        if connection is None:
+            connection = self.open()
+        return connection
+
+    def open(self) -> Connection:
+        """Open (or reuse) the connection of the calling thread.
+        Statements are committed as soon as they are executed
+        (autocommit mode) unless they run inside an explicit transaction
+
+        :return: The connection of the calling thread
+        :rtype: Connection
+        """
+        ident = threading.get_ident()
+        with self._lock:
+            if ident not in self._connections:
+                self._connections[ident] = sqlite.connect(
+                    self.db,
+                    isolation_level=None,
+                    check_same_thread=False,
+                    cached_statements=STATEMENT_CACHE_SIZE,
+                )
+            return self._connections[ident]
+
+    def close(self, current_thread: bool = False) -> None:
+        """Close every connection that this model has opened, from any thread.
+        The model can still be used afterwards, a new connection will be opened
+
+        :param current_thread: Close only the connection of the calling thread, defaults to False
+        :type current_thread: bool, optional
+        """
+        with self._lock:
+            if current_thread:
+                connection = self._connections.pop(threading.get_ident(), None)
+                connections = (connection,) if connection is not None else ()
+            else:
+                connections = tuple(self._connections.values())
+                self._connections.clear()
+        for connection in connections:
+            connection.close()
+
+    @contextmanager
+    def transaction(self) -> Generator[Connection, None, None]:
+        """Group every statement executed (by the calling thread) inside the
+        `with` block into one transaction that is committed once at the end,
+        or rolled back entirely if an exception is raised.
+        Nested blocks become savepoints of the outer transaction
+        ```
+            with model.transaction():
+                model.insert(user='john')
+                model.edit('user', 'anna', age=30)
+        ```
+
+        :yield: The connection of the calling thread
+        :rtype: Connection
+        """
+        connection = self.connection
+        if connection.in_transaction:
+            connection.execute("SAVEPOINT model")
+            try:
+                yield connection
+            except BaseException:
+                _rollback(connection, "ROLLBACK TO model", "RELEASE model")
+                raise
+            connection.execute("RELEASE model")
+        else:
+            # IMMEDIATE takes the write lock upfront, so a read-then-write
+            # block cannot deadlock with another process doing the same
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+                # A failed commit (eg. a reader still holds the db) must not
+                # leave the transaction open, it would swallow every later one
+                connection.execute("COMMIT")
+            except BaseException:
+                _rollback(connection, "ROLLBACK")
+                raise
+
+    def execute(self, query: str, fetch: bool = False, params: Params = ()) -> Any:
         """Execute a query
 
-        :param query: SQL Query
+        :param query: SQL Query, values should be passed as `?` placeholders
         :type query: str
         :param fetch: Choose wheather the data from the query needs to be
                       returned, defaults to False
         :type fetch: bool, optional
+        :param params: The values bound to the placeholders of the query, defaults to ()
+        :type params: Params, optional
         :return: The result of the query if `fetch=True` else None
         :rtype: Any
         """
-        with ConnectionManager(self.db) as cur:
-            data = cur.execute(query)
-            if fetch:
-                return data.fetchall()
-            return None
+        data = self.connection.execute(query, params)
+        if fetch:
+            return data.fetchall()
+        return None
 
     def create_table(self) -> None:
         """Create a table based on the `self.table` (**table) kwargs
@@ -76,24 +242,85 @@ class Model:
         """
         self.execute(query)
 
-    def insert(self, **values: str) -> None:
+    @property
+    def version(self) -> int:
+        """The schema version of the database, as stored in `PRAGMA user_version`
+
+        :return: How many migrations have been applied
+        :rtype: int
+        """
+        return self.execute("PRAGMA user_version", fetch=True)[0][0]
+
+    def migrate(self, migrations: Sequence[Migration]) -> int:
+        """Bring the schema up to date. `migrations[i]` upgrades the database
+        from version `i` to `i + 1`, so the list must only ever be appended to.
+        Each pending migration runs in its own transaction together with the
+        version bump, when the database is up to date this is a single PRAGMA read
+        ```
+            def add_age_index(model):
+                model.execute(f"CREATE INDEX age_idx ON {model.name} (age)")
+
+            model.migrate([add_age_index])
+        ```
+
+        :param migrations: Every migration of this table, in order
+        :type migrations: Sequence[Migration]
+        :return: The schema version after migrating
+        :rtype: int
+        """
+        if self.version >= len(migrations):
+            return self.version
+
+        for version, migration in enumerate(migrations):
+            with self.transaction():
+                # Re-checked under the write lock, another process may have
+                # migrated the database in the meantime
+                if self.version != version:
+                    continue
+                migration(self)
+                self.execute(f"PRAGMA user_version = {version + 1}")
+        return self.version
+
+    def insert(self, **values: Any) -> int:
         """Insert new values into the table
         (can accept arbitary number of values
         for a new inserion and leave the rest
         NULL as long as the table allows it)
+
+        :return: The id of the new row
+        :rtype: int
         """
-        cols = ','.join(map(str, values.keys()))
-        vals = ','.join(
-            f"'{i}'" if not isinstance(i, int)
-            else str(i) for i in list(values.values())
-        )
+        query = _insert_query(self.name, tuple(values))
+        return self.connection.execute(query, tuple(values.values())).lastrowid
 
-        query = f"""
-        INSERT INTO {self.name} ({cols}) VALUES (
-            {vals}
-        )
+    def insert_many(self, rows: Iterable[Mapping[str, Any]], ignore: bool = False) -> int:
+        """Insert many rows with a single statement inside one transaction.
+        All the rows must have the same keys as the first one
+        ```
+            model.insert_many([{'user': 'john', 'age': 25}, {'user': 'anna', 'age': 30}])
+        ```
+
+        :param rows: The rows to insert
+        :type rows: Iterable[Mapping[str, Any]]
+        :param ignore: Skip the rows that violate a constraint (eg. UNIQUE)
+                       instead of failing the whole batch, defaults to False
+        :type ignore: bool, optional
+        :return: How many rows were inserted
+        :rtype: int
         """
-        self.execute(query)
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            return 0
+        cols = tuple(first)
+        query = _insert_query(self.name, cols, 'INSERT OR IGNORE' if ignore else 'INSERT')
+        params = (
+            tuple(row[col] for col in cols)
+            for row in itertools.chain((first,), rows)
+        )
+
+        with self.transaction() as connection:
+            return connection.executemany(query, params).rowcount
 
     def fetch_all(self) -> Any:
         """Fetch all the data from the table
@@ -104,6 +331,128 @@ class Model:
         query = f"SELECT * FROM {self.name}"
         return self.execute(query, fetch=True)
 
+    def fetch_page(self, order_by: str = 'id', reverse: bool = False,
+                   limit: int | None = None, offset: int = 0) -> Any:
+        """Fetch the rows sorted by a column, optionally only a page of them.
+        The sorting is done by sqlite (using the column's index if there is one)
+        ```
+            # The 3rd page of 20 rows, newest first
+            model.fetch_page('id', reverse=True, limit=20, offset=40)
+        ```
+
+        :param order_by: The column to sort by, defaults to 'id'
+        :type order_by: str, optional
+        :param reverse: Sort in descending order, defaults to False
+        :type reverse: bool, optional
+        :param limit: The max ammount of rows, defaults to None (all of them)
+        :type limit: int | None, optional
+        :param offset: How many rows to skip, defaults to 0
+        :type offset: int, optional
+        :raises ValueError: If `order_by` is not a column of the table
+        :return: The rows of the page
+        :rtype: Any
+        """
+        if order_by not in self.table:
+            raise ValueError(f"Column `{order_by}` does not exist in `{self.name}`")
+        query = _page_query(self.name, order_by, 'DESC' if reverse else 'ASC')
+        return self.execute(query, True, (-1 if limit is None else limit, offset))
+
+    def create_search_index(self, *fields: str) -> None:
+        """Create the FTS5 index `<name>_fts` over the given text columns, fill it
+        with the existing rows and keep it in sync with triggers. Needed by `search`
+
+        :raises ValueError: If a field is not a column of the table
+        """
+        if not fields or any(field not in self.table for field in fields):
+            raise ValueError(f"Invalid fields {fields} for `{self.name}`")
+        fts, cols = f"{self.name}_fts", ', '.join(fields)
+        new = ', '.join(f"NEW.{field}" for field in fields)
+        old = ', '.join(f"OLD.{field}" for field in fields)
+        insert = f"INSERT INTO {fts} (rowid, {cols}) VALUES (NEW.id, {new});"
+        delete = f"INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', OLD.id, {old});"
+
+        self.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts}
+        USING fts5({cols}, content='{self.name}', content_rowid='id')
+        """)
+        self.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+        self.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {self.name}
+        BEGIN {insert} END
+        """)
+        self.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {self.name}
+        BEGIN {delete} END
+        """)
+        self.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {cols} ON {self.name}
+        BEGIN {delete} {insert} END
+        """)
+        self._search_fields = None
+
+    def search_fields(self) -> Tuple[str, ...]:
+        """The columns indexed by `create_search_index` (in this or in an
+        earlier run), empty if there is no index
+
+        :rtype: Tuple[str, ...]
+        """
+        if self._search_fields is None:
+            info = self.execute(f"PRAGMA table_info({self.name}_fts)", True)
+            self._search_fields = tuple(col for (_, col, *_) in info)
+        return self._search_fields
+
+    def search(self, query: str, fields: Sequence[str] | None = None,
+               limit: int | None = None) -> Any:
+        """Full-text search through the index made by `create_search_index`.
+        Every word of `query` has to match (as a prefix) and the best matches
+        come first
+        ```
+            model.search('buy milk', fields=('title',), limit=10)
+        ```
+
+        :param query: The words to look for
+        :type query: str
+        :param fields: Only search in these columns, defaults to None (all indexed)
+        :type fields: Sequence[str] | None, optional
+        :param limit: The max ammount of rows, defaults to None (all of them)
+        :type limit: int | None, optional
+        :raises ValueError: If a field is not in the search index
+        :return: The matching rows
+        :rtype: Any
+        """
+        if fields and any(field not in self.search_fields() for field in fields):
+            raise ValueError(f"Invalid fields {tuple(fields)} for `{self.name}`")
+        match = _match_expression(query, fields)
+        if not match:
+            return []
+        params = (match, -1 if limit is None else limit)
+        return self.execute(_search_query(self.name), True, params)
+
+    def count(self, where: Mapping[str, Any] | None = None) -> int:
+        """Count the rows of the table without fetching them
+        ```
+            model.count()  # All the rows
+            model.count({'user': 'john', 'age': 25})
+        ```
+
+        :param where: Columns and the values they have to match, defaults to None
+        :type where: Mapping[str, Any] | None, optional
+        :return: How many rows match
+        :rtype: int
+        """
+        where = where or {}
+        query = _count_query(self.name, tuple(where))
+        return self.execute(query, True, tuple(where.values()))[0][0]
+
+    def column_index(self, col: str) -> int:
+        """The position of a column in the rows of the table
+
+        :raises ValueError: If `col` is not a column of the table
+        """
+        if col not in self._columns:
+            raise ValueError(f"Column `{col}` does not exist in `{self.name}`")
+        return self._columns[col]
+
     def filter_row(self, data: Any, col: str | None = None) -> Any:
         """If `col` is provided, this function will filter out a certain
         colummn out of a row
@@ -119,9 +468,8 @@ class Model:
         :return: All the data or the selected column
         :rtype: Any
         """
-        enum_table = {row: num for (num, row) in enumerate(self.table)}
         if col is not None:
-            return data[0][enum_table[col]]
+            return data[0][self._columns[col]]
         return data
 
     def fetch_last(self, col: str | None = None) -> Any:
@@ -139,32 +487,38 @@ class Model:
         data = self.execute(query, fetch=True)
         return self.filter_row(data, col)
 
-    def edit(self, set: str, where: str) -> None:
-        """Edit a row based on a condition
+    def edit(self, field: str, value: Any, **values: Any) -> None:
+        """Edit the rows where `field` equals `value`
+        ```
+            model.edit('user', 'john', user='anna', age=30)
+        ```
 
-        :param set: Which column to set
-        :type set: str
-        :param where: Condition
-        :type where: str
-        """
-        query = f"""
-        UPDATE {self.name}
-        SET
-            {set}
-        WHERE
-            {where}
+        :param field: The column of the condition
+        :type field: str
+        :param value: The value that `field` has to match
+        :type value: Any
         """
-        self.execute(query)
+        query = _update_query(self.name, tuple(values), field)
+        self.execute(query, params=(*values.values(), value))
 
-    def delete(self, field: str, value: Any):
-        query = f"""
-        DELETE FROM {self.name}
-        WHERE {field}={value}
+    def delete(self, field: str, value: Any) -> None:
+        """Delete the rows where `field` equals `value`
+
+        :param field: The column of the condition
+        :type field: str
+        :param value: The value that `field` has to match
+        :type value: Any
         """
-        self.execute(query)
+        self.execute(_delete_query(self.name, field), params=(value,))
 
-    def select(self, field, value):
-        query = f"""
-        SELECT * FROM {self.name} WHERE {field}={value}
+    def select(self, field: str, value: Any) -> Any:
+        """Select the rows where `field` equals `value`
+
+        :param field: The column of the condition
+        :type field: str
+        :param value: The value that `field` has to match
+        :type value: Any
+        :return: The matching rows
+        :rtype: Any
         """
-        return self.execute(query, True)
+        return self.execute(_select_query(self.name, field), True, (value,))
@@ -1,7 +1,13 @@
 import os
+import asyncio
+import sqlite3
 import unittest
-from .model import Model
-from sqlite3 import OperationalError
+from .aio import AsyncModel
+from .model import Model, _insert_query
+from sqlite3 import (
+    OperationalError,
+    ProgrammingError,
+)
 
 
 BASE_DIR = f'{os.sep}'.join(__file__.split(os.sep)[:-1])
@@ -15,9 +21,11 @@ class TestModel(unittest.TestCase):
         }
 
         self.model = Model('test_db', BASE_DIR, **self.table)
+        self.model.create_table()
 
     def tearDown(self) -> None:
         self.model.execute(f"DELETE FROM {self.model.name}")
+        self.model.close()
 
     def test_create(self):
         self.model.create_table()
@@ -32,7 +40,7 @@ class TestModel(unittest.TestCase):
     def test_edit(self):
         self.model.insert(user='john', age=25)
         new_name = 'anna'
-        self.model.edit(f"user='{new_name}'", "user='john'")
+        self.model.edit('user', 'john', user=new_name)
         data = self.model.fetch_all()
         self.assertEqual(data[0][0], new_name)
 
@@ -43,13 +51,287 @@ class TestModel(unittest.TestCase):
         self.assertIsInstance(all_data, list)
         self.assertEqual(last_by, all_data[0][2])
 
+    def test_insert_id(self):
+        id = self.model.insert(user='john', age=25)
+        self.assertEqual(id, self.model.fetch_last('id'))
+
     def test_insert_one(self):
         name = 'Elvis'
         self.model.insert(user=name)
         insertion = self.model.fetch_last('user')
         self.assertEqual(name, insertion)
 
+    def test_connection_reuse(self):
+        connection = self.model.connection
+        self.model.insert(user='john', age=25)
+        self.model.fetch_all()
+        self.assertIs(connection, self.model.connection)
+
+    def test_close_reopen(self):
+        connection = self.model.open()
+        self.model.close()
+        self.assertIsNot(connection, self.model.connection)
+        self.assertIsInstance(self.model.fetch_all(), list)
+
+    def test_context_manager(self):
+        with self.model as model:
+            model.insert(user='john', age=25)
+            connection = model.connection
+        self.assertFalse(self.model._connections)
+        with self.assertRaises(ProgrammingError):
+            connection.execute("SELECT 1")
+
+    def test_select_delete(self):
+        name = "O'Brien"
+        self.model.insert(user=name, age=40)
+        self.model.insert(user='john', age=25)
+        self.assertEqual(self.model.select('user', name)[0][:2], (name, 40))
+        self.model.delete('user', name)
+        self.assertFalse(self.model.select('user', name))
+        self.assertEqual(len(self.model.fetch_all()), 1)
+
+    def test_statement_text_reused(self):
+        self.model.insert(user='john', age=25)
+        hits = _insert_query.cache_info().hits
+        self.model.insert(user='anna', age=30)
+        self.assertEqual(_insert_query.cache_info().hits, hits + 1)
+
+    def test_insert_many(self):
+        rows = ({'user': f'user{i}', 'age': i} for i in range(100))
+        self.assertEqual(self.model.insert_many(rows), 100)
+        self.assertEqual(len(self.model.fetch_all()), 100)
+        self.assertEqual(self.model.insert_many([]), 0)
+
+    def test_insert_many_rollback(self):
+        rows = [{'user': 'john', 'age': 25}, {'non_existing': 'something'}]
+        with self.assertRaises(KeyError):
+            self.model.insert_many(rows)
+        self.assertFalse(self.model.fetch_all())
+        self.assertFalse(self.model.connection.in_transaction)
+
+    def test_insert_many_ignore(self):
+        model = Model('test_db_unique', BASE_DIR, user='TEXT UNIQUE', age='INTEGER')
+        model.create_table()
+        rows = [{'user': 'john', 'age': 25}, {'user': 'anna', 'age': 30},
+                {'user': 'john', 'age': 40}]
+        self.assertEqual(model.insert_many(rows, ignore=True), 2)
+        self.assertEqual(model.select('user', 'john')[0][1], 25)
+        model.close()
+        os.remove(model.db)
+
+    def test_transaction_commit(self):
+        with self.model.transaction():
+            self.model.insert(user='john', age=25)
+            self.model.edit('user', 'john', age=26)
+            self.assertTrue(self.model.connection.in_transaction)
+        self.assertFalse(self.model.connection.in_transaction)
+        self.assertEqual(self.model.select('user', 'john')[0][1], 26)
+
+    def test_transaction_rollback(self):
+        with self.assertRaises(OperationalError):
+            with self.model.transaction():
+                self.model.insert(user='john', age=25)
+                self.model.insert(non_existing='something')
+        self.assertFalse(self.model.fetch_all())
+        self.assertFalse(self.model.connection.in_transaction)
+
+    def test_transaction_busy_commit(self):
+        self.model.insert(user='john', age=25)
+        self.model.connection.execute('PRAGMA busy_timeout = 0')
+        reader = sqlite3.connect(self.model.db, isolation_level=None)
+        reader.execute('BEGIN')
+        reader.execute(f"SELECT * FROM {self.model.name}").fetchall()  # Holds a shared lock
+        with self.assertRaises(OperationalError):
+            with self.model.transaction():
+                self.model.insert(user='anna', age=30)
+        self.assertFalse(self.model.connection.in_transaction)
+        reader.execute('COMMIT')
+        reader.close()
+
+        with self.model.transaction():
+            self.model.insert(user='elvis', age=42)
+        self.assertFalse(self.model.connection.in_transaction)
+        users = [row[0] for row in self.model.fetch_all()]
+        self.assertEqual(users, ['john', 'elvis'])
+
+    def test_transaction_already_rolled_back(self):
+        # The original error is raised, not the one of a second rollback
+        with self.assertRaises(ValueError):
+            with self.model.transaction():
+                with self.model.transaction():
+                    self.model.insert(user='john', age=25)
+                    self.model.connection.execute('ROLLBACK')
+                    raise ValueError
+        self.assertFalse(self.model.connection.in_transaction)
+        self.assertFalse(self.model.fetch_all())
+
+    def test_transaction_savepoint(self):
+        with self.model.transaction():
+            self.model.insert(user='john', age=25)
+            with self.assertRaises(ValueError):
+                with self.model.transaction():
+                    self.model.insert(user='anna', age=30)
+                    raise ValueError
+            with self.model.transaction():
+                self.model.insert(user='elvis', age=42)
+        users = [row[0] for row in self.model.fetch_all()]
+        self.assertEqual(users, ['john', 'elvis'])
+
+    def test_migrate(self):
+        model = Model('test_db_migrate', BASE_DIR, **self.table)
+        model.create_table()
+        applied = []
+
+        def add_index(model):
+            applied.append('index')
+            model.execute(f"CREATE INDEX {model.name}_age_idx ON {model.name} (age)")
+
+        def add_row(model):
+            applied.append('row')
+            model.insert(user='john', age=25)
+
+        def broken(model):
+            model.insert(user='anna', age=30)
+            raise ValueError
+
+        self.assertEqual(model.migrate([add_index]), 1)
+        self.assertEqual(model.migrate([add_index, add_row]), 2)
+        self.assertEqual(model.migrate([add_index, add_row]), 2)
+        self.assertEqual(applied, ['index', 'row'])
+
+        with self.assertRaises(ValueError):
+            model.migrate([add_index, add_row, broken])
+        self.assertEqual(model.version, 2)
+        self.assertEqual(len(model.fetch_all()), 1)
+
+        model.close()
+        os.remove(model.db)
+
+    def test_fetch_page(self):
+        self.model.insert_many({'user': f'user{i}', 'age': i % 3} for i in range(10))
+        rows = self.model.fetch_page('age')
+        self.assertEqual([row[1] for row in rows], sorted(i % 3 for i in range(10)))
+        first = self.model.fetch_page('age', reverse=True, limit=4)
+        second = self.model.fetch_page('age', reverse=True, limit=4, offset=4)
+        self.assertEqual(len(first), 4)
+        self.assertEqual(first + second, self.model.fetch_page('age', reverse=True)[:8])
+        with self.assertRaises(ValueError):
+            self.model.fetch_page('age; DROP TABLE test_db')
+
+    def test_count(self):
+        self.assertEqual(self.model.count(), 0)
+        self.model.insert_many({'user': f'user{i % 2}', 'age': i} for i in range(10))
+        self.assertEqual(self.model.count(), 10)
+        self.assertEqual(self.model.count({'user': 'user0'}), 5)
+        self.assertEqual(self.model.count({'user': 'user0', 'age': 2}), 1)
+
+    def test_search(self):
+        model = Model('test_db_search', BASE_DIR, title='TEXT', content='TEXT')
+        model.create_table()
+        model.create_search_index('title', 'content')
+        model.insert(title='groceries', content='buy milk and eggs')
+        model.insert(title='milk', content='the milk the milk')
+        model.insert(title='call "mom"', content='')
+
+        self.assertEqual(len(model.search('milk')), 2)
+        self.assertEqual(model.search('milk', limit=1)[0][0], 'milk')
+        self.assertEqual(model.search('gro')[0][0], 'groceries')
+        self.assertEqual(len(model.search('milk', fields=('title',))), 1)
+        self.assertEqual(model.search('"mom"')[0][0], 'call "mom"')
+        self.assertEqual(model.search('   '), [])
+
+        model.edit('title', 'groceries', content='bread')
+        model.delete('title', 'milk')
+        self.assertFalse(model.search('milk'))
+        self.assertEqual(len(model.search('bread')), 1)
+        self.assertEqual(model.search_fields(), ('title', 'content'))
+        for fields in (('nope',), ('id',)):  # Not indexed
+            with self.assertRaises(ValueError):
+                model.search('milk', fields=fields)
+
+        model.close()
+        os.remove(model.db)
+
+    def test_column_index(self):
+        self.assertEqual(self.model.column_index('age'), 1)
+        self.assertEqual(self.model.column_index('id'), 2)
+        with self.assertRaises(ValueError):
+            self.model.column_index('nope')
+
     def test_wrong_cols(self):
         insert = self.model.insert
         with self.assertRaises(OperationalError):
             insert(non_existing='something')
+
+
+class TestAsyncModel(unittest.TestCase):
+    def setUp(self) -> None:
+        self.model = Model('test_db_async', BASE_DIR, user='TEXT', age='INTEGER')
+        self.model.create_table()
+
+    def tearDown(self) -> None:
+        self.model.close()
+        os.remove(self.model.db)
+
+    def run_async(self, test) -> None:
+        async def run():
+            async with AsyncModel(self.model, max_pending=16) as model:
+                await test(model)
+        asyncio.run(run())
+
+    def test_crud(self):
+        async def test(model):
+            await model.insert(user='john', age=25)
+            self.assertEqual(await model.select('user', 'john'), [('john', 25, 1)])
+            await model.edit('user', 'john', age=30)
+            self.assertEqual((await model.fetch_all())[0][1], 30)
+            await model.delete('user', 'john')
+            self.assertEqual(await model.count(), 0)
+        self.run_async(test)
+
+    def test_batches(self):
+        batches = []
+
+        async def test(model):
+            execute = model._execute
+            model._execute = lambda batch: (batches.append(len(batch)), execute(batch))
+            ids = await asyncio.gather(*(model.insert(user=f"user {i}", age=i) for i in range(100)))
+            self.assertEqual(sorted(ids), list(range(1, 101)))
+        self.run_async(test)
+        self.assertEqual(sum(batches), 100)
+        self.assertLess(len(batches), 100)
+
+    def test_failing_request(self):
+        async def test(model):
+            results = await asyncio.gather(
+                model.insert(user='john'),
+                model.insert(non_existing='something'),
+                model.insert(user='anna'),
+                return_exceptions=True,
+            )
+            self.assertIsInstance(results[1], OperationalError)
+            self.assertEqual(await model.count(), 2)
+        self.run_async(test)
+
+    def test_iterate(self):
+        self.model.insert_many({'user': f"user {i % 7}", 'age': i} for i in range(50))
+
+        async def test(model):
+            rows = [row async for row in model.iterate('user', page_size=6)]
+            self.assertEqual(rows, self.model.fetch_page('user', limit=50))
+            rows = [row async for row in model.iterate('user', reverse=True, page_size=50)]
+            self.assertEqual(rows, self.model.fetch_page('user', reverse=True, limit=50))
+            with self.assertRaises(ValueError):
+                [row async for row in model.iterate('nope')]
+        self.run_async(test)
+
+    def test_close(self):
+        connection = self.model.connection
+        self.run_async(lambda model: model.insert(user='john'))
+        # Only the connection of the db thread is closed
+        self.assertIs(self.model.connection, connection)
+        self.assertEqual(len(self.model._connections), 1)
+
+    def test_not_started(self):
+        with self.assertRaises(RuntimeError):
+            asyncio.run(AsyncModel(self.model).fetch_all())
@@ -1,5 +1,4 @@
-from copy import copy
-import datetime
+import time
 
 
 class StickyCreationError(Exception): ...
@@ -15,8 +14,9 @@ class Note:
         self.title = title
         self.priority = priority
         self.done = 0
-        self._date_created = str(datetime.datetime.now().strftime("%d/%m/%Y"))
-        self._date_editited = copy(self._date_created)
+        # Epoch seconds, formatted only when displayed
+        self._date_created = int(time.time())
+        self._date_editited = self._date_created
 
     def __str__(self) -> str:
         return f"<Note {self.content}>"
@@ -14,8 +14,8 @@ class TestNote(unittest.TestCase):
             title='TEXT type UNIQUE',
             content='TEXT',
             priority='INTEGER',
-            date_created='TEXT',
-            date_edited='TEXT',
+            date_created='INTEGER',
+            date_edited='INTEGER',
             done='INTEGER'
         )
 
@@ -46,6 +46,7 @@ class TestNote(unittest.TestCase):
 
     def test_set_date(self):
         self.assertEqual(self.note.date_created, self.note.date_edited)
+        self.assertIsInstance(self.note.date_created, int)
 
     def test_insert(self):
         self.model.insert(
@@ -74,7 +75,7 @@ class TestNote(unittest.TestCase):
             date_created=self.note.date_created,
             done=self.note.done
         )
-        self.model.edit("priority=5", f"title='{self.note.title}'")
+        self.model.edit('title', self.note.title, priority=5)
         priority = self.model.fetch_last('priority')
         self.assertEqual(priority, 5)
         self.model.delete('title', self.note.title)
@@ -1,24 +1,36 @@
 #!/bin/env python3
 import sys
+from cli import daemon
 from cli.cli import cli
 from pathlib import Path
 from models import Model
-from logger import Logger
-from window.window import gui
+from logger import (
+    Logger,
+    JsonSink,
+)
 from jsonwrapper import Handler
 from actions.constants import BASE_DIR
+from actions.migrations import MIGRATIONS
 
 
 config = {
     'quiet': 1,
     'sort_by': 'priority',
     'search_by': 'title',
+    # `text` or `json` (one object per line, for scripts)
+    'log_format': 'text',
+    # Where `json` logs are appended, stdout if empty
+    'log_file': '',
 }
 
 configs = Handler(Path(f"{BASE_DIR}/.config.json"), config)
 configs.init()
 
-logger = Logger(configs.get('quiet'))
+sink = None
+if configs.get('log_format') == 'json':
+    sink = JsonSink(configs.get('log_file') or None)
+# Flushed by `cli` when the command is done
+logger = Logger(configs.get('quiet'), buffered=True, sink=sink)
 
 model = Model(
     'notes',
@@ -26,18 +38,29 @@ model = Model(
     title='TEXT type UNIQUE',
     content='TEXT',
     priority='INTEGER',
-    date_created='TEXT',
-    date_edited='TEXT',
+    date_created='INTEGER',
+    date_edited='INTEGER',
     done='INTEGER'
 )
-model.create_table()
 
 
 def main(args: list):
-    if len(args) > 1:
-        cli(args, model, logger, configs)
-    else:
-        gui(args, model, logger, configs)
+    if len(args) > 1 and not daemon.is_local(args[1:]):
+        response = daemon.request(args[1:])
+        if response is not None:  # The daemon ran it
+            status, output = response
+            sys.stdout.write(output)
+            return status
+
+    with model:
+        model.create_table()
+        model.migrate(MIGRATIONS)
+        if len(args) > 1:
+            cli(args, model, logger, configs)
+        else:
+            # PyQt5 is slow to import, the cli doesn't need it
+            from window.window import gui
+            gui(args, model, logger, configs)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,325 @@
+from __future__ import annotations
+import models
+from typing import (
+    Callable,
+    Mapping,
+    Tuple,
+    Dict,
+    Set,
+    Any,
+)
+from actions.dbapi import (
+    DB_ROW,
+    FIELDS,
+    DB_VALUES,
+    DATE_FIELDS,
+    format_date,
+    fetch_sorted,
+    is_descending,
+)
+from window.workers import Dispatcher
+from PyQt5.QtCore import (
+    QAbstractListModel,
+    QModelIndex,
+    QSize,
+    Qt,
+)
+from PyQt5.QtWidgets import (
+    QStyledItemDelegate,
+    QStyleOptionViewItem,
+    QApplication,
+    QStyle,
+)
+
+
+def sticky_text(sticky: DB_ROW, seperator: str = '\n') -> str:
+    """Visually add the type of each thing a sticky stores.
+
+    :param sticky: A row of the db
+    :type sticky: DB_ROW
+    :return: The sticky with its according labels, one field per line
+    :rtype: str
+    """
+    return seperator.join(
+        f"{field.capitalize()}: {format_date(value) if field in DATE_FIELDS else value}"
+        for (field, value) in zip(FIELDS, sticky)
+    )
+
+
+class ChangeSet:
+    """The ids of the stickies that were inserted, updated or deleted since
+    the list was last refreshed, see `StickiesModel.apply`
+    """
+    def __init__(self) -> None:
+        self.inserted: Set[int] = set()
+        self.updated: Set[int] = set()
+        self.deleted: Set[int] = set()
+
+    def __bool__(self) -> bool:
+        return bool(self.inserted or self.updated or self.deleted)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}(inserted={self.inserted},\
+ updated={self.updated}, deleted={self.deleted})>"
+
+    def insert(self, id: int) -> None:
+        self.inserted.add(id)
+
+    def update(self, id: int) -> None:
+        if id not in self.inserted:
+            self.updated.add(id)
+
+    def delete(self, id: int) -> None:
+        if id in self.inserted:
+            self.inserted.discard(id)
+            return
+        self.updated.discard(id)
+        self.deleted.add(id)
+
+    def clear(self) -> None:
+        self.inserted.clear()
+        self.updated.clear()
+        self.deleted.clear()
+
+
+def read_changed(model: models.Model, changes: ChangeSet) -> Dict[int, DB_ROW]:
+    """Select the current rows of the stickies that were inserted or updated,
+    as needed by `StickiesModel.apply`. Safe to call from any thread
+    """
+    stickies = {}
+    for id in changes.inserted | changes.updated:
+        selected = model.select('id', id)
+        if selected:
+            stickies[id] = selected[0]
+    return stickies
+
+
+class StickiesModel(QAbstractListModel):
+    """A list model that loads the stickies from the db one page at a time,
+    only when the view scrolls near the end of what is already loaded
+    (`canFetchMore`/`fetchMore`). It can also show a fixed list of stickies
+    (eg. search results) or a single message instead.
+    With a `Dispatcher` the pages are read in the background
+    """
+    PAGE_SIZE = 100
+    RowRole = Qt.ItemDataRole.UserRole + 1
+
+    def __init__(self, model: models.Model, parent: Any = None,
+                 dispatcher: Dispatcher | None = None) -> None:
+        super(StickiesModel, self).__init__(parent)
+        self.model = model
+        self.dispatcher = dispatcher
+        self._fetching = False
+        self._rows: DB_VALUES = []
+        self._message: str | None = None
+        # Fetches `limit` stickies starting at `offset`. None when all are loaded
+        self._source: Callable[[int, int], DB_VALUES] | None = None
+        # (column, descending) of the rows when they mirror the db, else None
+        self._order: Tuple[int, bool] | None = None
+
+    def _cancel_fetch(self) -> None:
+        """Forget the page being read, the rows it would extend have changed
+        """
+        if self._fetching and self.dispatcher is not None:
+            self.dispatcher.cancel('page')
+        self._fetching = False
+
+    def reload(self, sort_by: str, reversed: bool) -> None:
+        """Drop everything and start loading the stickies of the db
+        (sorted) page by page
+        """
+        self._cancel_fetch()
+        self.beginResetModel()
+        self._rows = []
+        self._message = None
+        self._source = lambda limit, offset: fetch_sorted(
+            self.model, sort_by, reversed, limit, offset
+        )
+        self._order = (FIELDS.index(sort_by), is_descending(sort_by, reversed))
+        self.endResetModel()
+
+    def set_rows(self, rows: DB_VALUES) -> None:
+        self._cancel_fetch()
+        self.beginResetModel()
+        self._rows = list(rows)
+        self._message = None
+        self._source = None
+        self._order = None
+        self.endResetModel()
+
+    def set_message(self, message: str) -> None:
+        self._cancel_fetch()
+        self.beginResetModel()
+        self._rows = []
+        self._message = message
+        self._source = None
+        self._order = None
+        self.endResetModel()
+
+    @property
+    def is_live(self) -> bool:
+        """Wheather the rows mirror the db (rather than a fixed list), so
+        changes to the db can be applied to them with `apply`
+        """
+        return self._order is not None
+
+    def _key(self, sticky: DB_ROW) -> Tuple[Any, int]:
+        return sticky[self._order[0]], sticky[FIELDS.index('id')]
+
+    def _row_of(self, id: int) -> int | None:
+        id_column = FIELDS.index('id')
+        for (row, sticky) in enumerate(self._rows):
+            if sticky[id_column] == id:
+                return row
+        return None
+
+    def _insertion_row(self, sticky: DB_ROW) -> int:
+        """Binary search for the row a sticky belongs to, in the sort order of the db
+        """
+        key, descending = self._key(sticky), self._order[1]
+        low, high = 0, len(self._rows)
+        while low < high:
+            middle = (low + high) // 2
+            other = self._key(self._rows[middle])
+            if (other > key) if descending else (other < key):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _remove(self, row: int) -> None:
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._rows[row]
+        self.endRemoveRows()
+
+    def _insert(self, sticky: DB_ROW) -> None:
+        row = self._insertion_row(sticky)
+        # Past the loaded rows it will be fetched (in place) by `fetchMore`
+        if row == len(self._rows) and self._source is not None:
+            return
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._rows.insert(row, sticky)
+        self.endInsertRows()
+
+    def apply(self, changes: ChangeSet, stickies: Mapping[int, DB_ROW] | None = None) -> None:
+        """Bring the loaded rows up to date by touching only the rows in
+        `changes`. Every row loaded stays a sorted prefix of the db, so the
+        next `fetchMore` continues from the right offset
+
+        :param changes: What changed in the db
+        :type changes: ChangeSet
+        :param stickies: The current rows of the inserted/updated ids (missing if
+                         deleted since), defaults to None (selected from the db)
+        :type stickies: Mapping[int, DB_ROW] | None, optional
+        :raises ValueError: If the model is not `is_live`
+        """
+        if not self.is_live:
+            raise ValueError("Only rows loaded from the db can be updated")
+        if stickies is None:
+            stickies = read_changed(self.model, changes)
+        # A page read before these changes would be misplaced
+        self._cancel_fetch()
+
+        for id in changes.deleted:
+            row = self._row_of(id)
+            if row is not None:
+                self._remove(row)
+
+        for id in changes.updated:
+            row = self._row_of(id)
+            sticky = stickies.get(id)
+            if sticky is None:
+                if row is not None:
+                    self._remove(row)
+                continue
+            if row is None:
+                self._insert(sticky)
+            elif self._key(sticky) == self._key(self._rows[row]):
+                self._rows[row] = sticky
+                index = self.index(row)
+                self.dataChanged.emit(index, index)
+            else:  # It moved
+                self._remove(row)
+                self._insert(sticky)
+
+        for id in changes.inserted:
+            if id in stickies:
+                self._insert(stickies[id])
+
+    def sticky(self, index: QModelIndex) -> DB_ROW | None:
+        """The sticky of a row of the view, None if the row is a message
+        """
+        if self._message is not None or not index.isValid():
+            return None
+        return self._rows[index.row()]
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return 1 if self._message is not None else len(self._rows)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            if self._message is not None:
+                return self._message
+            return sticky_text(self._rows[index.row()])
+        if role == StickiesModel.RowRole:
+            return self.sticky(index)
+        return None
+
+    def canFetchMore(self, parent: QModelIndex = QModelIndex()) -> bool:
+        return not parent.isValid() and self._source is not None
+
+    def fetchMore(self, parent: QModelIndex = QModelIndex()) -> None:
+        if not self.canFetchMore(parent) or self._fetching:
+            return
+        source, offset = self._source, len(self._rows)
+        if self.dispatcher is None:
+            self._add_page(source(StickiesModel.PAGE_SIZE, offset))
+            return
+        self._fetching = True
+        self.dispatcher.submit(
+            lambda: source(StickiesModel.PAGE_SIZE, offset),
+            self._add_page,
+            lambda _: setattr(self, '_fetching', False),
+            channel='page',
+        )
+
+    def _add_page(self, page: DB_VALUES) -> None:
+        self._fetching = False
+        if len(page) < StickiesModel.PAGE_SIZE:
+            self._source = None
+        if page:
+            first = len(self._rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+            self._rows.extend(page)
+            self.endInsertRows()
+
+
+class StickyDelegate(QStyledItemDelegate):
+    """Paints a sticky as lines of text with a gap below it. Every sticky
+    has the same height, so the view can lay out only the visible rows
+    """
+    MARGIN = 10
+
+    def sizeHint(self, option: QStyleOptionViewItem, index: QModelIndex) -> QSize:
+        lines = len(FIELDS)
+        height = option.fontMetrics.lineSpacing() * lines + StickyDelegate.MARGIN
+        return QSize(option.rect.width(), height)
+
+    def paint(self, painter: Any, option: QStyleOptionViewItem, index: QModelIndex) -> None:
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawPrimitive(QStyle.PrimitiveElement.PE_PanelItemViewItem, option, painter,
+                            option.widget)
+
+        text_color = option.palette.text()
+        if option.state & QStyle.StateFlag.State_Selected:
+            text_color = option.palette.highlightedText()
+        painter.save()
+        painter.setPen(text_color.color())
+        rect = option.rect.adjusted(2, 0, -2, -StickyDelegate.MARGIN)
+        painter.drawText(rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop,
+                         index.data(Qt.ItemDataRole.DisplayRole))
+        painter.restore()
@@ -0,0 +1,226 @@
+import os
+import time
+import unittest
+import threading
+from unittest import mock
+from models import Model
+from actions.migrations import MIGRATIONS
+from actions.dbapi import (
+    FIELDS,
+    fetch_sorted,
+)
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+from window.workers import Dispatcher  # noqa: E402
+from window.listmodel import (  # noqa: E402
+    StickiesModel,
+    ChangeSet,
+)
+
+
+BASE_DIR = f'{os.sep}'.join(__file__.split(os.sep)[:-1])
+NOTES_TABLE = {
+    'title': 'TEXT type UNIQUE',
+    'content': 'TEXT',
+    'priority': 'INTEGER',
+    'date_created': 'INTEGER',
+    'date_edited': 'INTEGER',
+    'done': 'INTEGER',
+}
+app = QApplication.instance() or QApplication([])
+
+
+def settle(dispatcher: Dispatcher) -> None:
+    """Wait for the jobs and deliver their results
+    """
+    dispatcher.wait()
+    app.processEvents()
+
+
+class TestChangeSet(unittest.TestCase):
+    def test_changes(self):
+        changes = ChangeSet()
+        self.assertFalse(changes)
+        changes.insert(1)
+        changes.update(1)  # Still a new sticky
+        changes.update(2)
+        changes.insert(3)
+        changes.delete(3)  # Never seen by the list
+        changes.update(4)
+        changes.delete(4)
+        self.assertEqual((changes.inserted, changes.updated, changes.deleted), ({1}, {2}, {4}))
+        changes.clear()
+        self.assertFalse(changes)
+
+
+class TestStickiesModel(unittest.TestCase):
+    def setUp(self) -> None:
+        self.model = Model('test_listmodel', BASE_DIR, **NOTES_TABLE)
+        self.model.create_table()
+        self.model.migrate(MIGRATIONS)
+        # Priorities repeat, so the ties are broken by id
+        for i in range(10):
+            self.add(f"title {i}", i % 4 + 1)
+        self.list_model = StickiesModel(self.model)
+        patcher = mock.patch.object(StickiesModel, 'PAGE_SIZE', 3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self) -> None:
+        self.model.close()
+        os.remove(self.model.db)
+
+    def add(self, title: str, priority: int, done: int = 0) -> int:
+        return self.model.insert(title=title, content='', priority=priority,
+                                 date_created=0, date_edited=0, done=done)
+
+    def rows(self) -> list:
+        return [self.list_model.sticky(self.list_model.index(row))
+                for row in range(self.list_model.rowCount())]
+
+    def load(self, sort_by: str, reversed: bool, pages: int) -> None:
+        self.sort = (sort_by, reversed)
+        self.list_model.reload(sort_by, reversed)
+        for _ in range(pages):
+            self.list_model.fetchMore()
+
+    def assertMirrorsDb(self) -> None:
+        """The loaded rows are the first ones of the db, and the pages
+        fetched after them complete it without gaps or repeats
+        """
+        rows = self.rows()
+        self.assertEqual(rows, fetch_sorted(self.model, *self.sort, len(rows)))
+        while self.list_model.canFetchMore():
+            self.list_model.fetchMore()
+        self.assertEqual(self.rows(), fetch_sorted(self.model, *self.sort))
+
+    def test_insert_and_move(self):
+        self.load('priority', False, 2)
+        changes = ChangeSet()
+        changes.insert(self.add('new', 1))
+        moved = self.rows()[0][FIELDS.index('id')]
+        self.model.edit('id', moved, priority=2)
+        changes.update(moved)
+        self.list_model.apply(changes)
+        self.assertEqual(self.list_model.rowCount(), 7)
+        self.assertMirrorsDb()
+
+    def test_insert_past_loaded_rows(self):
+        self.load('priority', False, 1)
+        changes = ChangeSet()
+        changes.insert(self.add('new', 4))
+        self.list_model.apply(changes)
+        # It's fetched with its page
+        self.assertEqual(self.list_model.rowCount(), 3)
+        self.assertMirrorsDb()
+
+    def test_update_in_place(self):
+        self.load('priority', False, 1)
+        id = self.rows()[1][FIELDS.index('id')]
+        self.model.edit('id', id, content='edited')
+        changes = ChangeSet()
+        changes.update(id)
+        self.list_model.apply(changes)
+        self.assertEqual(self.rows()[1][FIELDS.index('content')], 'edited')
+        self.assertMirrorsDb()
+
+    def test_delete(self):
+        self.load('priority', False, 2)
+        changes = ChangeSet()
+        for row in (0, 4):
+            id = self.rows()[row][FIELDS.index('id')]
+            self.model.delete('id', id)
+            changes.delete(id)
+        self.list_model.apply(changes)
+        self.assertEqual(self.list_model.rowCount(), 4)
+        self.assertMirrorsDb()
+
+    def toggle_done(self, reversed: bool) -> None:
+        for i in range(0, 10, 3):
+            self.model.edit('title', f"title {i}", done=1)
+        self.load('done', reversed, 2)
+        changes = ChangeSet()
+        for row in (0, 5):
+            sticky = self.rows()[row]
+            id, done = sticky[FIELDS.index('id')], sticky[FIELDS.index('done')]
+            self.model.edit('id', id, done=int(not done))
+            changes.update(id)
+        changes.insert(self.add('new', 1, done=1))
+        self.list_model.apply(changes)
+        self.assertMirrorsDb()
+
+    def test_done(self):
+        # Unlike the other fields `done` sorts descending when not reversed
+        self.toggle_done(False)
+
+    def test_done_reversed(self):
+        self.toggle_done(True)
+
+    def test_not_live(self):
+        self.list_model.set_rows(fetch_sorted(self.model, 'priority', False))
+        with self.assertRaises(ValueError):
+            self.list_model.apply(ChangeSet())
+
+    def test_background_pages(self):
+        dispatcher = Dispatcher()
+        list_model = StickiesModel(self.model, dispatcher=dispatcher)
+        list_model.reload('title', False)
+        list_model.fetchMore()
+        # Reloading drops the page that is still being read
+        list_model.reload('priority', False)
+        settle(dispatcher)
+        self.assertEqual(list_model.rowCount(), 0)
+        list_model.fetchMore()
+        settle(dispatcher)
+        self.assertEqual(list_model.rowCount(), 3)
+        rows = [list_model.sticky(list_model.index(row)) for row in range(3)]
+        self.assertEqual(rows, fetch_sorted(self.model, 'priority', False, 3))
+
+
+class TestDispatcher(unittest.TestCase):
+    def setUp(self) -> None:
+        self.dispatcher = Dispatcher()
+        self.results = []
+
+    def tearDown(self) -> None:
+        settle(self.dispatcher)
+
+    def test_channel_supersedes(self):
+        def slow():
+            time.sleep(0.1)
+            return 'old'
+
+        self.dispatcher.submit(slow, self.results.append, channel='search')
+        self.dispatcher.submit(lambda: 'new', self.results.append, channel='search')
+        self.dispatcher.submit(lambda: 'other', self.results.append, channel='page')
+        settle(self.dispatcher)
+        self.assertEqual(sorted(self.results), ['new', 'other'])
+
+    def test_cancel_queued(self):
+        release = threading.Event()
+        ran = []
+        # Keep every reader busy, so the next job waits in the queue
+        for _ in range(Dispatcher.READ_THREADS):
+            self.dispatcher.submit(release.wait, lambda _: None)
+        self.dispatcher.submit(lambda: ran.append(True), self.results.append, channel='page')
+        self.dispatcher.cancel('page')
+        release.set()
+        settle(self.dispatcher)
+        self.assertEqual((ran, self.results), ([], []))
+        self.assertFalse(self.dispatcher.busy)
+
+    def test_writes_in_order(self):
+        for i in range(10):
+            self.dispatcher.submit(lambda i=i: i, self.results.append, write=True)
+        settle(self.dispatcher)
+        self.assertEqual(self.results, list(range(10)))
+
+    def test_errors_and_busy(self):
+        busy = []
+        self.dispatcher.busy_changed.connect(busy.append)
+        self.dispatcher.submit(lambda: 1 / 0, self.results.append, self.results.append)
+        self.assertTrue(self.dispatcher.busy)
+        settle(self.dispatcher)
+        self.assertIsInstance(self.results[0], ZeroDivisionError)
+        self.assertEqual(busy, [True, False])
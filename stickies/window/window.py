@@ -1,24 +1,35 @@
-import os
+from __future__ import annotations
 import models
 import logger
 import jsonwrapper
 import webbrowser as web
-from typing import Generator
 from pathlib import Path
+from actions import services
+from typing import (
+    Callable,
+    Any,
+)
 from notes.note import Note
 from typing import Literal
 from actions.constants import LabelColor, get_icon
 from PyQt5 import uic, QtGui
 from PyQt5.QtGui import QFont
 from actions.constants import VERSIONS
+from window.workers import Dispatcher
+from window.listmodel import (
+    StickiesModel,
+    StickyDelegate,
+    ChangeSet,
+    read_changed,
+)
 from actions.dbapi import (
-    DB_ROW,
     FIELDS,
     DB_VALUES,
-    sort_by,
+    DATE_FIELDS,
+    format_date,
+    fetch_sorted,
     get_total,
     sanitize_entry,
-    sanitize_command,
 )
 from PyQt5.QtCore import (
     Qt,
@@ -32,7 +43,7 @@ from PyQt5.QtWidgets import (
     QMainWindow,
     QPushButton,
     QVBoxLayout,
-    QListWidget,
+    QListView,
     QComboBox,
     QLineEdit,
     QDialog,
@@ -43,14 +54,14 @@ from PyQt5.QtWidgets import (
 # TODO: Make search_lbl wider
 class Stickies(QMainWindow):
     UIFILE = Path('window/untitled.ui')
-    VIEW_SEPERATOR = '\n'
     THEME_COLOR = 'rgb(38, 147, 217)'
+    SEARCH_DELAY = 250  # ms of no typing before a search runs
 
     def __init__(self, model: models.Model, logger: logger.Logger,
                  configs: jsonwrapper.Handler) -> None:
         super(Stickies, self).__init__()
         uic.loadUi(Stickies.UIFILE, self)
-        self.app_icon = QtGui.QIcon(get_icon['Sticky'])
+        self.app_icon = QtGui.QIcon(get_icon('Sticky'))
         self.setWindowIcon(self.app_icon)
         self.setWindowTitle(f"Stickies v{VERSIONS[-1]}")
 
@@ -58,6 +69,15 @@ class Stickies(QMainWindow):
         self.logger = logger
         self.model = model
         self.configs = configs
+        # Every db access runs in the background, see `_write`
+        self.dispatcher = Dispatcher(self)
+        self.dispatcher.busy_changed.connect(self._set_busy)
+        # Search state, see `handle_search_query`
+        self._search_snapshot: DB_VALUES | None = None
+        self._search_cache: tuple[str, DB_VALUES] | None = None
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(Stickies.SEARCH_DELAY)
 
         # Load widgets
         self._load_line_edits()
@@ -67,18 +87,16 @@ class Stickies(QMainWindow):
 
         # Set up
         self.refresh_btn.setToolTip("Refresh")
-        self.load_stickies(self.model.fetch_all())
+        self._reload_stickies()
         self.priority_ln.setReadOnly(True)
         self.priority_ln.setText('1')
         self.stickies_view.setSelectionMode(3)  # 3 -> ExtendedSelection
-        self.search_ln.textChanged.connect(self.handle_search_query)
+        self._search_timer.timeout.connect(self.handle_search_query)
+        self.search_ln.textChanged.connect(lambda: self._search_timer.start())
 
         self.title_ln.setMaxLength(Note.MAX_TITLE_LEN)
         self.search_ln.setMaxLength(Note.MAX_TITLE_LEN)
         self.content_ln.setMaxLength(Note.MAX_CONTENT_LEN)
-        self.stickies_view.setStyleSheet(
-            "QListWidget::item {margin-bottom: 10px;}"
-        )
 
         # MENU
         # Triggers
@@ -86,10 +104,10 @@ class Stickies(QMainWindow):
         self.actionEdit.triggered.connect(self.edit_settings)
         self.actionSource_code.triggered.connect(lambda: web.open('github.com/hor00s/Stickies'))
         # Icons
-        self.actionView.setIcon(QtGui.QIcon(get_icon['view']))
-        self.actionEdit.setIcon(QtGui.QIcon(get_icon['edit']))
-        self.actionShortcuts.setIcon(QtGui.QIcon(get_icon['shortcuts']))
-        self.actionSource_code.setIcon(QtGui.QIcon(get_icon['source']))
+        self.actionView.setIcon(QtGui.QIcon(get_icon('view')))
+        self.actionEdit.setIcon(QtGui.QIcon(get_icon('edit')))
+        self.actionShortcuts.setIcon(QtGui.QIcon(get_icon('shortcuts')))
+        self.actionSource_code.setIcon(QtGui.QIcon(get_icon('source')))
 
         # Button commands
         self.save_btn.clicked.connect(self.save)
@@ -124,7 +142,7 @@ class Stickies(QMainWindow):
 
         self.search_lbl = self.findChild(QLabel, 'search_lbl')
         self._update_search_lbl()
-        self.total_stickies_lbl.setText(self.get_total_stickes())
+        self._update_total()
 
         self.title_lbl.setStyleSheet(label_style)
         self.content_lbl.setStyleSheet(label_style)
@@ -138,7 +156,11 @@ class Stickies(QMainWindow):
         self.search_ln = self.findChild(QLineEdit, 'search_ln')
 
     def _load_lists(self):
-        self.stickies_view = self.findChild(QListWidget, 'sticky_view')
+        self.stickies_view = self.findChild(QListView, 'sticky_view')
+        self.stickies_model = StickiesModel(self.model, self, self.dispatcher)
+        self.stickies_view.setModel(self.stickies_model)
+        self.stickies_view.setItemDelegate(StickyDelegate(self.stickies_view))
+        self.stickies_view.setUniformItemSizes(True)
 
     def _load_buttons(self):
         self.save_btn = self.findChild(QPushButton, 'save_btn')
@@ -154,17 +176,17 @@ class Stickies(QMainWindow):
         self.refresh_btn = self.findChild(QPushButton, 'refresh_btn')
         self.reverse_order_cmd = self.findChild(QRadioButton, 'reverse_order_cmd')
 
-        self.save_btn.setIcon(QtGui.QIcon(get_icon['save']))
-        self.cancel_btn.setIcon(QtGui.QIcon(get_icon['cancel']))
-        self.priority_up_btn.setIcon(QtGui.QIcon(get_icon['plus']))
-        self.priority_down_btn.setIcon(QtGui.QIcon(get_icon['minus']))
-        self.edit_btn.setIcon(QtGui.QIcon(get_icon['edit']))
-        self.delete_btn.setIcon(QtGui.QIcon(get_icon['delete']))
-        self.delete_all_btn.setIcon(QtGui.QIcon(get_icon['deleteall']))
-        self.delete_done_btn.setIcon(QtGui.QIcon(get_icon['deletedone']))
-        self.mark_done_btn.setIcon(QtGui.QIcon(get_icon['markdone']))
-        self.mark_undone_btn.setIcon(QtGui.QIcon(get_icon['markundone']))
-        self.refresh_btn.setIcon(QtGui.QIcon(get_icon['refresh']))
+        self.save_btn.setIcon(QtGui.QIcon(get_icon('save')))
+        self.cancel_btn.setIcon(QtGui.QIcon(get_icon('cancel')))
+        self.priority_up_btn.setIcon(QtGui.QIcon(get_icon('plus')))
+        self.priority_down_btn.setIcon(QtGui.QIcon(get_icon('minus')))
+        self.edit_btn.setIcon(QtGui.QIcon(get_icon('edit')))
+        self.delete_btn.setIcon(QtGui.QIcon(get_icon('delete')))
+        self.delete_all_btn.setIcon(QtGui.QIcon(get_icon('deleteall')))
+        self.delete_done_btn.setIcon(QtGui.QIcon(get_icon('deletedone')))
+        self.mark_done_btn.setIcon(QtGui.QIcon(get_icon('markdone')))
+        self.mark_undone_btn.setIcon(QtGui.QIcon(get_icon('markundone')))
+        self.refresh_btn.setIcon(QtGui.QIcon(get_icon('refresh')))
 
     def get_total_stickes(self) -> str:
         return f"Total: {get_total(self.model)}"
@@ -172,30 +194,77 @@ class Stickies(QMainWindow):
     def _refresh_list(self):
         """Empties the whole list of stickies and reloads them
         """
-        self.stickies_view.clear()
-        self.load_stickies(self.model.fetch_all())
-        self.total_stickies_lbl.setText(self.get_total_stickes())
+        self._invalidate_search()
+        self._reload_stickies()
+        self._update_total()
+
+    def _update_total(self):
+        self.dispatcher.submit(
+            self.get_total_stickes,
+            self.total_stickies_lbl.setText,
+            channel='total',
+        )
+
+    def _set_busy(self, busy: bool):
+        if busy:
+            self.setCursor(Qt.CursorShape.BusyCursor)
+        else:
+            self.unsetCursor()
+
+    def _on_error(self, error: Exception):
+        self.info_label("error", str(error), LabelColor.ERROR.value, self.info_lbl)
+
+    def _write(self, action: Callable[[ChangeSet], Any], on_done: Callable[[Any], None]):
+        """Run `action` on the (single) writer thread. It changes the db and
+        records the ids it changed in the given `ChangeSet`; then only those
+        stickies are updated in the list, which keeps the scroll position and
+        the selection. Search results are replaced by the full list, like
+        `_refresh_list`. Finally `on_done` gets what `action` returned
+
+        :param action: Changes the db, it must not touch any widget
+        :type action: Callable[[ChangeSet], Any]
+        :param on_done: Runs in the GUI thread once the list is updated
+        :type on_done: Callable[[Any], None]
+        """
+        changes = ChangeSet()
+
+        def job():
+            result = action(changes)
+            return result, read_changed(self.model, changes), self.get_total_stickes()
+
+        def apply(value):
+            result, stickies, total = value
+            self._invalidate_search()
+            if self.stickies_model.is_live:
+                self.stickies_model.apply(changes, stickies)
+            else:
+                self._reload_stickies()
+            self.total_stickies_lbl.setText(total)
+            on_done(result)
+
+        self.dispatcher.submit(job, apply, self._on_error, write=True)
+
+    def _invalidate_search(self):
+        """Drop the search snapshot, the data it was taken from has changed
+        """
+        self.dispatcher.cancel('search')
+        self._search_snapshot = None
+        self._search_cache = None
 
     def _update_search_lbl(self):
         label = "Search:"
         self.search_lbl.setText(f"{label} ({self.configs.get('search_by')})")
 
-    def _make_command(self, flags: str):
-        os.system(f"./stickies.py {sanitize_command(flags)}")
+    def _selected_title(self) -> str | None:
+        """The title of the sticky that is currently selected in the list
 
-    def _get_title_from_item(self, list_item) -> str:
-        """By parsing the text of a sticky as it's represented in the list,
-        this function extracts the title ONLY
-
-        :param list_item: A list item
-        :type list_item: QListItem
-        :return: Title
-        :rtype: str
+        :return: Title, or None if there is no (sticky) selected
+        :rtype: str | None
         """
-        exlude = len("Title: ")
-        item_text = list_item.text()
-        title = item_text.split(Stickies.VIEW_SEPERATOR)[0][exlude:]
-        return title
+        if not self.stickies_view.selectionModel().hasSelection():
+            return None
+        sticky = self.stickies_model.sticky(self.stickies_view.currentIndex())
+        return None if sticky is None else sticky[FIELDS.index('title')]
 
     def _info_label(self, header: str, msg: str, rgb: tuple[int], label: QLabel, seconds: int = 3):
         """Interface for self.info_label. DO NOT USE DIRECTLY.
@@ -207,44 +276,13 @@ class Stickies(QMainWindow):
         label.show()
         return label
 
-    def _add_stickie_fields(self, stickies: DB_VALUES)\
-            -> Generator[DB_ROW, None, None]:
-        """Visually add the type of each thing a sticky stores.
-
-        :yield: A Sticky with its according labels
-        :rtype: DB_ROW
-        """
-        other = []
-        for sticky in stickies:
-            temp = map(
-                lambda i: f"{FIELDS[i[0]].capitalize()}: {i[1]}",
-                enumerate(sticky)
-            )
-            other.append(list(temp))
-        yield from other
-
-    def _sort_stickies(self, stickies: DB_VALUES)\
-            -> Generator[DB_ROW, None, None]:
-        """This function re-orders the stickies to the way that
-        is configed by the user
-
-        :yield: The stickies row by row
-        :rtype: DB_ROW
+    def _reload_stickies(self):
+        """Point the list back to the db, the stickies are loaded lazily
+        (a page at a time) as the list is scrolled
         """
         sort_method = self.configs.get('sort_by')
-
-        sorted_stickies = stickies
         reversed = self.reverse_order_cmd.isChecked()
-        yield from sort_by(sort_method, sorted_stickies, reversed)
-
-    def _clear_selections(self):
-        """Set the color of the stickies as QListItems back to the
-        default (black)
-        """
-        self.stickies_view.selectedItems()
-        for i in range(self.stickies_view.count()):
-            current_item = self.stickies_view.item(i)
-            current_item.setForeground(Qt.GlobalColor.black)
+        self.stickies_model.reload(sort_method, reversed)
 
     def view_settings(self):
         """Create a string with the saved configurations and display them
@@ -262,6 +300,8 @@ class Stickies(QMainWindow):
         def set_values(config_key, config_value):
             config_value.clear()
             key = config_key.currentText()
+            # Any path can be typed for the log file
+            config_value.setEditable(key == 'log_file')
             for value in settings[key]:
                 config_value.addItem(str(value))
             config_value.setCurrentText(str(self.configs.get(key)))
@@ -285,7 +325,7 @@ class Stickies(QMainWindow):
                 info_lbl,
             )
 
-        assert len(self.configs.read()) == 3, "Unhandled setting"
+        assert len(self.configs.read()) == 5, "Unhandled setting"
         height, width = 300, 300
         layout = QVBoxLayout()
         dialog = QDialog()
@@ -312,6 +352,8 @@ class Stickies(QMainWindow):
             'quiet': range(1, Note.MAX_PRIORITY + 1),
             'sort_by': FIELDS,
             'search_by': FIELDS,
+            'log_format': ('text', 'json'),
+            'log_file': ('',),
         }
 
         for key in settings:
@@ -343,15 +385,9 @@ class Stickies(QMainWindow):
         QTimer.singleShot(seconds * 1000, label.hide)
 
     def load_stickies(self, stickies: DB_VALUES):
-        """Loads all the saved stickies from the db and adds the to the GUI
+        """Shows (only) the given, already sorted, stickies in the GUI
         """
-        stickies = self._sort_stickies(stickies)
-        stickies = self._add_stickie_fields(stickies)
-
-        for sticky in stickies:
-            self.stickies_view.addItem(
-                Stickies.VIEW_SEPERATOR.join(map(str, sticky))
-            )
+        self.stickies_model.set_rows(stickies)
 
     def save(self):
         """Takes all the input fields from the user and saves them in the db
@@ -361,27 +397,28 @@ class Stickies(QMainWindow):
             msg = "Title cannon be empty"
             self.info_label("WARNING", msg, LabelColor.ERROR.value, self.info_lbl)
         else:
-            exists = self.model.execute(
-                f"SELECT * FROM {self.model.name} WHERE\
-                     title='{sanitize_entry(title)}'", True
-            )
-            content = self.content_ln.text()
-            priority = self .priority_ln.text()
-
-            if exists:
-                self._make_command(
-                    f'edit -t "{title}" -sc "{self.content_ln.text()}" -sp\
-                         {int(self.priority_ln.text())}'
-                )
-                msg = f"Sticky `{title}` has been edited"
-                self.info_label("edit", msg, LabelColor.SUCCESS.value, self.info_lbl)
-            else:
-                flags = f'add -t "{title}" -c "{content}" -p {priority}'
-                self._make_command(flags)
-                msg = f"Sticky `{title}` is now added"
-                self.info_label('new', msg, LabelColor.SUCCESS.value, self.info_lbl)
+            title = sanitize_entry(title)
+            content = sanitize_entry(self.content_ln.text())
+            priority = int(self.priority_ln.text())
+
+            def save(changes: ChangeSet) -> bool:
+                id = services.edit(self.model, title, content, priority)
+                if id is not None:
+                    changes.update(id)
+                    return True
+                changes.insert(services.add(self.model, title, content, priority))
+                return False
+
+            def saved(edited: bool):
+                if edited:
+                    msg = f"Sticky `{title}` has been edited"
+                    self.info_label("edit", msg, LabelColor.SUCCESS.value, self.info_lbl)
+                else:
+                    msg = f"Sticky `{title}` is now added"
+                    self.info_label('new', msg, LabelColor.SUCCESS.value, self.info_lbl)
+
+            self._write(save, saved)
 
-        self._refresh_list()
         self.title_ln.setText('')
 
     def cancel(self):
@@ -414,25 +451,33 @@ class Stickies(QMainWindow):
             self.priority_ln.setText('5')
 
     def delete_done(self):
-        flags = 'clear_done'
-        self._make_command(flags)
-        self._refresh_list()
+        def clear_done(changes: ChangeSet):
+            for id in services.clear_done(self.model):
+                changes.delete(id)
+
         msg = "All items marked as `done` have been removed"
-        self.info_label("info", msg, LabelColor.INFO.value, self.info_lbl)
+        self._write(
+            clear_done,
+            lambda _: self.info_label("info", msg, LabelColor.INFO.value, self.info_lbl),
+        )
 
     def delete_all(self):
-        flags = 'purge_all'
-        self._make_command(flags)
-        self._refresh_list()
+        self._write(lambda _: services.purge(self.model), lambda _: self._refresh_list())
 
     def delete_one(self):
-        exists = self.stickies_view.selectedItems()
+        title = self._selected_title()
+        exists = title is not None
         if exists:
-            title = self._get_title_from_item(self.stickies_view.currentItem())
-            self._make_command(f'remove -t "{title}"')
-            self._refresh_list()
+            def remove(changes: ChangeSet):
+                id = services.remove(self.model, title)
+                if id is not None:
+                    changes.delete(id)
+
             msg = f"Sticky `{title}` has been removed"
-            self.info_label("info", msg, LabelColor.WARNING.value, self.info_lbl)
+            self._write(
+                remove,
+                lambda _: self.info_label("info", msg, LabelColor.WARNING.value, self.info_lbl),
+            )
         elif not exists:
             msg = "You have no active selection"
             self.info_label("info", msg, LabelColor.ERROR.value, self.info_lbl)
@@ -445,19 +490,27 @@ class Stickies(QMainWindow):
         This function will overwrite a sticky if the title is un-changed.
         Otherwise it'll just create a new one
         """
-        exists = self.stickies_view.selectedItems()
+        title = self._selected_title()
+        exists = title is not None
         if exists:
-            title = self._get_title_from_item(self.stickies_view.currentItem())
-            title, content, priority, *_ = self.model.select(
-                'title',
-                f"'{sanitize_entry(title)}'"
-            )[0]
-
-            self.title_ln.setText(title)
-            self.content_ln.setText(content)
-            self.priority_ln.setText(str(priority))
-            msg = f"Sticky `{title}` is being edited"
-            self.info_label("info", msg, LabelColor.INFO.value, self.info_lbl)
+            def fill(rows: DB_VALUES):
+                if not rows:
+                    msg = f"Sticky `{title}` does not exist anymore"
+                    self.info_label("info", msg, LabelColor.WARNING.value, self.info_lbl)
+                    return
+                title_, content, priority, *_ = rows[0]
+                self.title_ln.setText(title_)
+                self.content_ln.setText(content)
+                self.priority_ln.setText(str(priority))
+                msg = f"Sticky `{title_}` is being edited"
+                self.info_label("info", msg, LabelColor.INFO.value, self.info_lbl)
+
+            self.dispatcher.submit(
+                lambda: self.model.select('title', sanitize_entry(title)),
+                fill,
+                self._on_error,
+                channel='edit',
+            )
         elif not exists:
             msg = "You have no active selection"
             self.info_label("info", msg, LabelColor.WARNING.value, self.info_lbl)
@@ -466,16 +519,19 @@ class Stickies(QMainWindow):
             self.info_label("succes", msg, LabelColor.ERROR.value, self.info_lbl)
 
     def change_done_status(self, is_done: bool):
-        if self.stickies_view.selectedItems():
-            title = self._get_title_from_item(self.stickies_view.currentItem())
-            if is_done:
-                self._make_command(f'set_done -t "{title}"')
-            elif not is_done:
-                self._make_command(f'set_undone -t "{title}"')
-            self._refresh_list()
+        title = self._selected_title()
+        if title is not None:
+            def set_done(changes: ChangeSet):
+                id = services.set_done(self.model, title, is_done)
+                if id is not None:
+                    changes.update(id)
+
             msg = f"Status of `{title}` has beed changed!"
-            self.info_label("success", msg, LabelColor.SUCCESS.value, self.info_lbl)
-        elif not self.stickies_view.selectedItems():
+            self._write(
+                set_done,
+                lambda _: self.info_label("success", msg, LabelColor.SUCCESS.value, self.info_lbl),
+            )
+        elif title is None:
             msg = "You have no active selection"
             self.info_label("info", msg, LabelColor.WARNING.value, self.info_lbl)
         else:
@@ -483,22 +539,44 @@ class Stickies(QMainWindow):
             self.info_label("info", msg, LabelColor.ERROR.value, self.info_lbl)
 
     def handle_search_query(self):
-        """This function is bound with the `search` input field
-        and on every input it'll display the stickies that match the query
-        and temporarily remove the rest
+        """This function is bound with the `search` input field (debounced
+        by `self._search_timer`) and it'll display the stickies that match
+        the query and temporarily remove the rest.
+        The stickies are read once into a snapshot; when the query extends
+        the previous one, only the previous matches are scanned again.
+        The scan runs in the background and a newer query cancels it
         """
-        matching = []
         query = self.search_ln.text()
-        stickies = self.model.fetch_all()
         if query:
-            self.stickies_view.clear()
-            for sticky in stickies:
-                if query in str(self.model.filter_row([sticky], self.configs.get('search_by'))):
-                    matching.append(sticky)
-            if matching:
-                self.load_stickies(matching)
-            elif not matching:
-                self.stickies_view.addItem(f"<Nothing found matching `{query}`>")
+            snapshot, cache = self._search_snapshot, self._search_cache
+            search_by = self.configs.get('search_by')
+            sort_method = self.configs.get('sort_by')
+            reversed = self.reverse_order_cmd.isChecked()
+            column = FIELDS.index(search_by)
+
+            def search():
+                stickies = snapshot
+                if stickies is None:
+                    stickies = fetch_sorted(self.model, sort_method, reversed)
+                candidates = stickies
+                if cache is not None and cache[0] in query:
+                    candidates = cache[1]
+
+                if search_by in DATE_FIELDS:
+                    matching = [s for s in candidates if query in format_date(s[column])]
+                else:
+                    matching = [s for s in candidates if query in str(s[column])]
+                return stickies, matching
+
+            def show(result):
+                self._search_snapshot, matching = result
+                self._search_cache = (query, matching)
+                if matching:
+                    self.load_stickies(matching)
+                elif not matching:
+                    self.stickies_model.set_message(f"<Nothing found matching `{query}`>")
+
+            self.dispatcher.submit(search, show, self._on_error, channel='search')
         else:
             self._refresh_list()
 
@@ -509,3 +587,4 @@ def gui(args: list, logger: logger.Logger, model: models.Model,
     ui = Stickies(logger, model, configs)
     ui.show()
     app.exec_()
+    ui.dispatcher.wait()
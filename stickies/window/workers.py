@@ -0,0 +1,125 @@
+from __future__ import annotations
+from typing import (
+    Callable,
+    Dict,
+    Set,
+    Any,
+)
+from PyQt5.QtCore import (
+    pyqtSignal,
+    QThreadPool,
+    QRunnable,
+    QObject,
+)
+
+
+class WorkerSignals(QObject):
+    """The signals of a `Worker`. They are emitted from the pool's thread
+    and delivered (queued) to the thread that created them
+    """
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object)
+
+
+class Worker(QRunnable):
+    def __init__(self, job: Callable[[], Any]) -> None:
+        super(Worker, self).__init__()
+        # Owned by the `Dispatcher` that started it, not by the pool
+        self.setAutoDelete(False)
+        self.job = job
+        self.signals = WorkerSignals()
+
+    def run(self) -> None:
+        try:
+            result = self.job()
+        except Exception as e:
+            self.signals.failed.emit(e)
+        else:
+            self.signals.finished.emit(result)
+
+
+class Dispatcher(QObject):
+    """Runs jobs (db work) off the GUI thread and hands their results back
+    to it. Reads run on a small pool while writes run one at a time, in the
+    order they were submitted.
+    Jobs submitted on a `channel` supersede each other: submitting or
+    cancelling a channel drops the result of its older jobs, and the ones
+    that have not started yet are not run at all
+    """
+    READ_THREADS = 2
+    busy_changed = pyqtSignal(bool)
+
+    def __init__(self, parent: Any = None) -> None:
+        super(Dispatcher, self).__init__(parent)
+        self.readers = QThreadPool(self)
+        self.readers.setMaxThreadCount(Dispatcher.READ_THREADS)
+        self.writer = QThreadPool(self)
+        self.writer.setMaxThreadCount(1)
+        self._generations: Dict[str, int] = {}
+        self._queued: Dict[str, Worker] = {}
+        # Keeps the workers (and so their signals) alive until they report back
+        self._running: Set[Worker] = set()
+
+    @property
+    def busy(self) -> bool:
+        return bool(self._running)
+
+    def submit(self, job: Callable[[], Any], on_result: Callable[[Any], None],
+               on_error: Callable[[Exception], None] | None = None,
+               channel: str | None = None, write: bool = False) -> None:
+        """Run `job` in the background and call `on_result` with what it
+        returns (or `on_error` with what it raises) in the GUI thread
+
+        :param job: The work to do, it must not touch any widget
+        :type job: Callable[[], Any]
+        :param on_result: Gets the return value of `job`
+        :type on_result: Callable[[Any], None]
+        :param on_error: Gets the exception raised by `job`, defaults to None (ignored)
+        :type on_error: Callable[[Exception], None] | None, optional
+        :param channel: Cancel the previous jobs of this channel, defaults to None
+        :type channel: str | None, optional
+        :param write: Run on the (single) writer thread, defaults to False
+        :type write: bool, optional
+        """
+        generation = None
+        if channel is not None:
+            self.cancel(channel)
+            generation = self._generations[channel]
+
+        worker = Worker(job)
+        if channel is not None:
+            self._queued[channel] = worker
+
+        def report(callback: Callable[[Any], None] | None, value: Any) -> None:
+            self._running.discard(worker)
+            if self._queued.get(channel) is worker:
+                del self._queued[channel]
+            if not self._running:
+                self.busy_changed.emit(False)
+            stale = channel is not None and self._generations[channel] != generation
+            if callback is not None and not stale:
+                callback(value)
+
+        worker.signals.finished.connect(lambda result: report(on_result, result))
+        worker.signals.failed.connect(lambda error: report(on_error, error))
+
+        if not self._running:
+            self.busy_changed.emit(True)
+        self._running.add(worker)
+        (self.writer if write else self.readers).start(worker)
+
+    def wait(self) -> None:
+        """Block until every job that was started has finished
+        """
+        self.readers.waitForDone()
+        self.writer.waitForDone()
+
+    def cancel(self, channel: str) -> None:
+        """Drop the result of every job submitted on `channel` so far
+        """
+        self._generations[channel] = self._generations.get(channel, 0) + 1
+        worker = self._queued.pop(channel, None)
+        if worker is not None and self.readers.tryTake(worker):
+            self._running.discard(worker)
+            if not self._running:
+                self.busy_changed.emit(False)